@@ -3,15 +3,30 @@ Migration script to add Year and Month columns to the Google Sheet.
 This script will:
 1. Add 'Year' and 'Month' column headers
 2. Populate these columns for all existing rows by parsing the Date column
+
+Every Year/Month cell is computed locally from one read of the sheet, then only columns
+G:H are written, in `batch_update` calls of --chunk-size rows. Rows that already hold
+the right values are skipped, and progress is saved to a checkpoint file after each
+chunk, so an interrupted run picks up where it stopped.
+
+Usage: python add_year_month_columns.py [--dry-run] [--chunk-size 500] [--restart]
 """
 
-from services.sheets import get_sheet_client, SHEET_ID
+from services.sheets import get_worksheet, SHEET_ID
 from datetime import datetime
+import argparse
+import json
 import logging
+import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DEFAULT_CHUNK_SIZE = 500
+CHECKPOINT_FILE = os.path.join(os.path.dirname(__file__), "data", "add_year_month_columns.checkpoint.json")
+MAX_RETRIES = 5
+
 def parse_date(date_str):
     """Parse date string from multiple formats."""
     for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
@@ -21,76 +36,154 @@ def parse_date(date_str):
             continue
     return None
 
-def add_year_month_columns():
+def load_checkpoint(path):
+    try:
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("sheet_id") != SHEET_ID:
+        logger.warning("Ignoring checkpoint written for a different sheet")
+        return None
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def plan_updates(data, start_row=2):
+    """
+    [(row_num, [year, month])] for rows from `start_row` whose G:H cells don't already
+    hold the values parsed from their Date, plus the count of unparseable dates.
+    """
+    updates = []
+    unparsed = 0
+    for i, row in enumerate(data[1:], start=2):  # Skip header, row numbers start at 2
+        if i < start_row or len(row) < 1 or not row[0]:
+            continue
+
+        date_str = row[0]  # Date is in column 1
+        parsed_date = parse_date(date_str)
+        if not parsed_date:
+            logger.warning(f"Row {i}: Could not parse date '{date_str}'")
+            unparsed += 1
+            continue
+
+        year = parsed_date.year
+        month = parsed_date.strftime("%B")  # Full month name (January, February, etc.)
+        current = (row[6] if len(row) > 6 else "", row[7] if len(row) > 7 else "")
+        if current != (str(year), month):
+            updates.append((i, [year, month]))
+    return updates, unparsed
+
+def to_ranges(updates):
+    """Group consecutive rows into G{a}:H{b} ranges for batch_update."""
+    ranges = []
+    for row_num, values in updates:
+        if ranges and ranges[-1]["end"] == row_num - 1:
+            ranges[-1]["end"] = row_num
+            ranges[-1]["values"].append(values)
+        else:
+            ranges.append({"start": row_num, "end": row_num, "values": [values]})
+    return [{"range": f"G{r['start']}:H{r['end']}", "values": r["values"]} for r in ranges]
+
+def write_chunk(sheet, chunk):
+    """One batch_update for a chunk, retried with backoff on rate limits and server errors."""
+    from gspread.exceptions import APIError
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return sheet.batch_update(to_ranges(chunk))
+        except APIError as e:
+            code = getattr(e, "code", None)
+            if attempt == MAX_RETRIES or not (code == 429 or (code or 0) >= 500):
+                raise
+            delay = min(2 ** attempt, 60)
+            logger.warning(f"Sheets returned {code}; retrying in {delay}s")
+            time.sleep(delay)
+
+def add_year_month_columns(chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, checkpoint_path=CHECKPOINT_FILE, restart=False):
     """Add Year and Month columns to the sheet and populate existing rows."""
-    client = get_sheet_client()
-    if not client:
+    sheet = get_worksheet()
+    if not sheet:
         logger.error("Failed to get sheet client")
         return
-    
+
     try:
-        sheet = client.open_by_key(SHEET_ID).sheet1
-        
+
         # Get all data
         data = sheet.get_all_values()
         if not data:
             logger.error("No data found in sheet")
             return
-        
+
         headers = data[0]
         logger.info(f"Current headers: {headers}")
-        
-        # Check if Year and Month columns already exist
-        if 'Year' in headers and 'Month' in headers:
-            logger.info("Year and Month columns already exist")
-            return
-        
+
+        checkpoint = None if restart else load_checkpoint(checkpoint_path)
+        start_row = checkpoint["next_row"] if checkpoint else 2
+        if checkpoint:
+            logger.info(f"Resuming from row {start_row} ({checkpoint['updated']} rows already written)")
+
         # Add headers for Year and Month (columns 7 and 8)
-        if len(headers) < 7:
-            # Append Year and Month to headers
-            headers.extend(['Year', 'Month'])
-            sheet.update('A1:H1', [headers])
-            logger.info("Added Year and Month column headers")
-        
-        # Process each row and add Year and Month
-        rows_to_update = []
-        for i, row in enumerate(data[1:], start=2):  # Skip header, row numbers start at 2
-            if len(row) < 1:
-                continue
-            
-            date_str = row[0]  # Date is in column 1
-            parsed_date = parse_date(date_str)
-            
-            if parsed_date:
-                year = parsed_date.year
-                month = parsed_date.strftime("%B")  # Full month name (January, February, etc.)
-                
-                # Extend row to include Year and Month
-                while len(row) < 8:
-                    row.append("")
-                row[6] = year  # Column 7 (G)
-                row[7] = month  # Column 8 (H)
-                
-                rows_to_update.append((i, row))
-                logger.info(f"Row {i}: Date={date_str}, Year={year}, Month={month}")
+        header_cells = (headers[6] if len(headers) > 6 else "", headers[7] if len(headers) > 7 else "")
+        if header_cells != ("Year", "Month"):
+            if any(c.strip() for c in header_cells):
+                # Another layout (e.g. migrate_sheets.py's 12 columns): writing here would
+                # overwrite its headers, and its rows don't have a date in column A
+                logger.error(f"Columns G:H already hold {list(header_cells)}, not Year/Month; aborting")
+                return
+            if dry_run:
+                logger.info("[dry run] Would add Year and Month column headers")
             else:
-                logger.warning(f"Row {i}: Could not parse date '{date_str}'")
-        
-        # Batch update all rows
-        if rows_to_update:
-            for row_num, row_data in rows_to_update:
-                # Update the entire row
-                range_name = f"A{row_num}:H{row_num}"
-                sheet.update(range_name, [row_data[:8]])  # Only update first 8 columns
-            
-            logger.info(f"Successfully updated {len(rows_to_update)} rows with Year and Month data")
-        
+                sheet.update([["Year", "Month"]], "G1:H1")
+                logger.info("Added Year and Month column headers")
+
+        updates, unparsed = plan_updates(data, start_row)
+        logger.info(f"{len(updates)} rows need Year/Month values ({unparsed} dates could not be parsed)")
+        if dry_run:
+            for row_num, (year, month) in updates[:20]:
+                logger.info(f"[dry run] Row {row_num}: Year={year}, Month={month}")
+            chunks = (len(updates) + chunk_size - 1) // chunk_size
+            logger.info(f"[dry run] Would write {len(updates)} rows in {chunks} batch_update calls")
+            return
+
+        updated = checkpoint["updated"] if checkpoint else 0
+        for offset in range(0, len(updates), chunk_size):
+            chunk = updates[offset:offset + chunk_size]
+            write_chunk(sheet, chunk)
+            updated += len(chunk)
+            save_checkpoint(checkpoint_path, {
+                "sheet_id": SHEET_ID,
+                "next_row": chunk[-1][0] + 1,
+                "updated": updated,
+                "updated_at": datetime.now().isoformat()
+            })
+            logger.info(f"Wrote rows {chunk[0][0]}-{chunk[-1][0]} ({updated} rows so far)")
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        logger.info(f"Successfully updated {updated} rows with Year and Month data")
+
+        # Reconcile the API's local store with the rewritten columns
+        from services.store import sync_from_sheet
+        sync_from_sheet(full=True)
+
         logger.info("Migration completed successfully!")
-        
+
     except Exception as e:
         logger.error(f"Error during migration: {e}")
         raise
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add Year and Month columns to the transactions sheet.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per batch_update call")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_FILE, help="checkpoint file used to resume")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start from row 2")
+    args = parser.parse_args()
+
     logger.info("Starting migration to add Year and Month columns...")
-    add_year_month_columns()
+    add_year_month_columns(args.chunk_size, args.dry_run, args.checkpoint, args.restart)
@@ -0,0 +1,95 @@
+# backend/benchmarks/datasets.py
+"""
+Synthetic transaction histories shaped like the real sheet.
+
+Rows use the 8-column layout (Date, Amount, Category, Type, Description, Timestamp,
+Year, Month) with the quirks analytics has to cope with: dates in the three accepted
+formats, amounts stored as text with a leading apostrophe, mixed-case types, spending
+out of savings categories, a few legacy rows without Year/Month and a few unparseable
+amounts. Generation is deterministic for a given seed.
+"""
+import random
+from datetime import date, datetime, timedelta
+
+HEADERS = ["Date", "Amount", "Category", "Type", "Description", "Timestamp", "Year", "Month"]
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y")
+
+START_DATE = date(2023, 1, 1)
+DAYS = 3 * 365
+# The month benchmarks query: inside the generated range and fully populated
+QUERY_MONTH, QUERY_YEAR = 6, 2025
+
+def _categories():
+    from services.categories import get_categories
+    cats = get_categories()
+    return (
+        list(cats.expense) or ["food"],
+        list(cats.income) or ["job"],
+        list(cats.savings) or ["emergency fund"]
+    )
+
+def generate_rows(count: int, seed: int = 42, legacy_fraction: float = 0.01, invalid_fraction: float = 0.001):
+    """Header row plus `count` transaction rows."""
+    rng = random.Random(seed)
+    expense, income, savings = _categories()
+    choices = (
+        [("expense", c) for c in expense] * 6
+        + [("income", c) for c in income]
+        + [("savings", c) for c in savings] * 2
+        # Spending out of a savings category (subtracted from overall savings)
+        + [("expense", c) for c in savings]
+    )
+    rows = [list(HEADERS)]
+    for i in range(count):
+        day = START_DATE + timedelta(days=rng.randrange(DAYS))
+        kind, category = rng.choice(choices)
+        if kind == "income":
+            value = round(rng.uniform(500, 50000), 2)
+        else:
+            value = round(rng.uniform(5, 3000), 2)
+
+        roll = rng.random()
+        if roll < invalid_fraction:
+            amount = "n/a"
+        elif roll < 0.5:
+            amount = f"'{value:g}"
+        else:
+            amount = f"{value:g}"
+
+        legacy = rng.random() < legacy_fraction
+        rows.append([
+            day.strftime(rng.choice(DATE_FORMATS)),
+            amount,
+            category,
+            kind.capitalize() if rng.random() < 0.1 else kind,
+            f"synthetic {kind} {i}",
+            datetime(day.year, day.month, day.day, rng.randrange(24), rng.randrange(60)).strftime("%Y-%m-%d %H:%M:%S"),
+            "" if legacy else str(day.year),
+            "" if legacy else day.strftime("%B")
+        ])
+    return rows
+
+def generate_budgets(month: int = QUERY_MONTH, year: int = QUERY_YEAR, seed: int = 42):
+    """One budget per expense and savings category for a month."""
+    rng = random.Random(seed)
+    expense, _, savings = _categories()
+    return [
+        {"id": f"bench-{i}", "category": category, "amount": round(rng.uniform(500, 20000), 2),
+         "month": month, "year": year, "threshold": 0.8}
+        for i, category in enumerate(expense + savings)
+    ]
+
+def generate_transactions(count: int, seed: int = 42, month: int = QUERY_MONTH, year: int = QUERY_YEAR):
+    """/api/confirm payloads (Transaction dicts) dated in the given month."""
+    rng = random.Random(seed)
+    expense, _, _ = _categories()
+    return [
+        {
+            "transaction_type": "expense",
+            "date": date(year, month, rng.randint(1, 28)).isoformat(),
+            "category": rng.choice(expense),
+            "amount": round(rng.uniform(5, 500), 2),
+            "description": f"benchmark {i}"
+        }
+        for i in range(count)
+    ]
@@ -0,0 +1,182 @@
+# backend/benchmarks/fakes.py
+"""
+In-process stand-ins for Google Sheets and OpenRouter, so benchmarks run with no network.
+
+FakeSheetsClient is installed as services.sheets' authorized client; everything above
+it (get_spreadsheet, get_worksheet, with_worksheet, the snapshot, the local store and
+add_transactions_to_sheet) runs unchanged. FakeOpenRouter replaces the AsyncOpenAI
+client in services.processing and answers chat.completions.create with a canned
+extraction after an optional simulated latency.
+"""
+import asyncio
+import json
+import re
+import time
+from types import SimpleNamespace
+
+_RANGE = re.compile(r"^([A-Z]+)(\d+)(?::([A-Z]+)(\d*))?$")
+
+def _column_number(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+def _cell(value):
+    # Sheets renders 250.0 as "250"; every value comes back as a string
+    if isinstance(value, float):
+        return "%g" % value
+    return str(value)
+
+class FakeWorksheet:
+    """The subset of gspread.Worksheet the app uses, backed by a list of rows."""
+
+    def __init__(self, rows, title="Sheet1", sheet_id=0):
+        self.rows = rows
+        self.title = title
+        self.id = sheet_id
+        self.calls = {}
+        # Stands in for the spreadsheet's Drive modifiedTime
+        self.modified = 0
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def touch(self):
+        """Record a change made by editing `rows` directly."""
+        self.modified += 1
+
+    @property
+    def row_count(self):
+        return max(len(self.rows), 1000)
+
+    @property
+    def col_count(self):
+        return max((len(r) for r in self.rows[:1]), default=8)
+
+    def get_all_values(self):
+        self._count("get_all_values")
+        # Outer list copied, rows shared: callers treat rows as read-only, and copying
+        # every cell of a 1M-row sheet would dominate the measurement
+        return list(self.rows)
+
+    def _read(self, range_name):
+        match = _RANGE.match(range_name.split("!")[-1])
+        if not match:
+            raise ValueError(f"Unsupported range {range_name!r}")
+        first_col, first_row, last_col, last_row = match.groups()
+        start = int(first_row)
+        end = int(last_row) if last_row else (len(self.rows) if last_col else start)
+        lo, hi = _column_number(first_col) - 1, _column_number(last_col or first_col)
+        return [list(r[lo:hi]) for r in self.rows[start - 1:end]]
+
+    def get(self, range_name=None, **kwargs):
+        self._count("get")
+        return self._read(range_name)
+
+    def batch_get(self, ranges, **kwargs):
+        self._count("batch_get")
+        return [self._read(r) for r in ranges]
+
+    def append_rows(self, values, **kwargs):
+        self._count("append_rows")
+        start = len(self.rows) + 1
+        self.rows.extend([_cell(v) for v in row] for row in values)
+        self.touch()
+        return {"updates": {"updatedRange": f"{self.title}!A{start}:H{len(self.rows)}"}}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def update(self, values, range_name="A1", **kwargs):
+        self._count("update")
+        match = _RANGE.match(range_name)
+        row = int(match.group(2)) - 1
+        while len(self.rows) < row + len(values):
+            self.rows.append([])
+        for i, value in enumerate(values):
+            self.rows[row + i] = [_cell(v) for v in value]
+        self.touch()
+
+class FakeSpreadsheet:
+    def __init__(self, worksheet):
+        self.sheet1 = worksheet
+
+    def get_worksheet_by_id(self, sheet_id):
+        return self.sheet1
+
+    def get_lastUpdateTime(self):
+        return f"2025-01-01T00:00:00.{self.sheet1.modified:06d}Z"
+
+class FakeSheetsClient:
+    """Stands in for the client returned by gspread.authorize."""
+
+    def __init__(self, rows):
+        self.worksheet = FakeWorksheet(rows)
+        self.spreadsheet = FakeSpreadsheet(self.worksheet)
+
+    def open_by_key(self, key):
+        return self.spreadsheet
+
+def install_fake_sheets(rows):
+    """Make services.sheets use a FakeSheetsClient over `rows`; returns its worksheet."""
+    from services import sheets
+    client = FakeSheetsClient(rows)
+    with sheets._client_lock:
+        sheets._client = client
+        sheets._creds = None
+        sheets._client_created_at = time.monotonic()
+        # Opened again through the fake client on first use
+        sheets._spreadsheet = None
+        sheets._worksheet = None
+    return client.worksheet
+
+class FakeOpenRouter:
+    """
+    AsyncOpenAI stand-in: chat.completions.create returns one extracted expense whose
+    amount is the first number in the user message. With stream=True the JSON array is
+    sent as `stream_chunks` deltas.
+    """
+
+    def __init__(self, latency_ms=0.0, stream_chunks=8):
+        self.latency = latency_ms / 1000
+        self.stream_chunks = stream_chunks
+        self.requests = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _content(self, messages):
+        text = messages[-1]["content"] if isinstance(messages[-1]["content"], str) else ""
+        amount = re.search(r"\d+(?:\.\d+)?", text)
+        return json.dumps([{
+            "transaction_type": "expense",
+            "date": time.strftime("%Y-%m-%d"),
+            "time": "",
+            "category": "food",
+            "amount": float(amount.group()) if amount else 0.0,
+            "vault_location": "Other",
+            "description": text[:40],
+            "detail_source_item": ""
+        }])
+
+    async def create(self, model=None, messages=None, stream=False, **kwargs):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        content = self._content(messages)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        return self._stream(content)
+
+    async def _stream(self, content):
+        size = max(1, len(content) // self.stream_chunks)
+        for start in range(0, len(content), size):
+            delta = SimpleNamespace(content=content[start:start + size])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+def install_fake_llm(latency_ms=0.0):
+    """Make services.processing send extraction requests to a FakeOpenRouter."""
+    from services import processing
+    fake = FakeOpenRouter(latency_ms)
+    with processing._client_lock:
+        processing.client = fake
+    return fake
@@ -0,0 +1,247 @@
+# backend/benchmarks/run.py
+"""
+Offline benchmarks for the analytics, alert, confirm and text-extraction paths.
+
+Each dataset size gets a synthetic sheet served by an in-process fake gspread client;
+LLM calls go to a fake OpenRouter client, budgets to a temporary budgets.json and the
+local SQLite store is off, so nothing touches the network or the app's data files.
+Timings are reported per (benchmark, rows) as min/median/p95/mean milliseconds and can
+be written as JSON and compared with an earlier run to catch regressions.
+
+Usage: python benchmarks/run.py [--sizes 1000,10000,100000] [--repeat 20] [--seed 42]
+       [--llm-latency-ms 0] [--output results.json] [--compare previous.json]
+       [--threshold 0.25] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Read by the services at import time: no local store, no snapshot expiry mid-run and
+# no on-disk LLM cache
+os.environ.setdefault("LOCAL_STORE_ENABLED", "0")
+os.environ.setdefault("SNAPSHOT_TTL_SECONDS", "86400")
+os.environ.setdefault("LLM_CACHE_DIR", "")
+
+from benchmarks.datasets import QUERY_MONTH, QUERY_YEAR, generate_budgets, generate_rows, generate_transactions
+from benchmarks.fakes import install_fake_llm, install_fake_sheets
+
+DEFAULT_SIZES = "1000,10000,100000"
+# Full reloads and index rebuilds take seconds on the largest sheets
+MAX_RELOAD_RUNS = 3
+CONFIRM_BATCH = 20
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": ordered[0],
+        "median_ms": statistics.median(ordered),
+        "p95_ms": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "mean_ms": statistics.fmean(ordered),
+        "max_ms": ordered[-1],
+    }
+
+def measure(func, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+def reset_alerts():
+    from services import alerts
+    with alerts._lock:
+        alerts._periods.clear()
+
+def use_temporary_budgets(directory, seed):
+    from services import budgets
+    budgets._repository = budgets.BudgetRepository(os.path.join(directory, "budgets.json"))
+    budgets._repository.replace_all(generate_budgets(seed=seed))
+
+def http_client():
+    try:
+        from fastapi.testclient import TestClient
+    except ImportError:
+        return None
+    import main
+    # No context manager: the lifespan (warmup, background store sync) is not needed
+    return TestClient(main.app)
+
+def post_confirm(client, payload):
+    response = client.post("/api/confirm", json=payload)
+    if response.status_code != 200 or any(r["status"] != "success" for r in response.json()):
+        raise RuntimeError(f"/api/confirm failed: {response.status_code} {response.text[:200]}")
+
+def bench_size(size, repeat, seed, client):
+    from services import snapshot
+    from services.aggregates import invalidate_index
+    from services.analytics import (
+        calculate_monthly_summary, get_aggregate_index, get_all_transactions, get_chart_data, get_overall_savings
+    )
+    from services.budgets import check_alerts
+
+    started = time.perf_counter()
+    install_fake_sheets(generate_rows(size, seed))
+    generated_ms = (time.perf_counter() - started) * 1000
+    snapshot.invalidate()
+    reset_alerts()
+
+    reloads = min(repeat, MAX_RELOAD_RUNS)
+    month, year = QUERY_MONTH, QUERY_YEAR
+    results = {
+        "load_snapshot": measure(get_all_transactions, reloads, setup=snapshot.invalidate),
+        "build_index": measure(get_aggregate_index, reloads, setup=invalidate_index),
+        "calculate_monthly_summary": measure(lambda: calculate_monthly_summary(month, year), repeat),
+        "get_chart_data": measure(lambda: get_chart_data(month, year), repeat),
+        "get_overall_savings": measure(get_overall_savings, repeat),
+        "check_alerts": measure(lambda: check_alerts(month, year), repeat),
+        "check_alerts_cold": measure(lambda: check_alerts(month, year), repeat, setup=reset_alerts),
+    }
+    if client is not None:
+        # Last: every confirm appends to the sheet, so the dataset grows from here on
+        single = iter(generate_transactions(repeat, seed))
+        results["confirm_1"] = measure(lambda: post_confirm(client, [next(single)]), repeat)
+        batches = iter([generate_transactions(CONFIRM_BATCH, seed + i) for i in range(repeat)])
+        results[f"confirm_{CONFIRM_BATCH}"] = measure(lambda: post_confirm(client, next(batches)), repeat)
+    return generated_ms, results
+
+def bench_processing(repeat, client):
+    """Text extraction through the API: the rule-based fast path and the (fake) LLM."""
+    from services import processing
+    results = {}
+
+    def post_text(text):
+        response = client.post("/api/process/text", data={"text": text})
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/process/text failed: {response.status_code} {response.text[:200]}")
+
+    results["process_text_fast_path"] = measure(lambda: post_text("lunch 250 taka"), repeat)
+    enabled = processing.FAST_PATH_ENABLED
+    processing.FAST_PATH_ENABLED = False
+    try:
+        # A unique text each time, so every request misses the LLM cache
+        results["process_text_llm"] = measure(lambda: post_text(f"paid 120 for {uuid.uuid4().hex}"), repeat)
+    finally:
+        processing.FAST_PATH_ENABLED = enabled
+    return results
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+def run(sizes, repeat, seed, llm_latency_ms):
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "repeat": repeat,
+            "seed": seed,
+            "llm_latency_ms": llm_latency_ms,
+        },
+        "results": [],
+    }
+    fake_llm = install_fake_llm(llm_latency_ms)
+    client = http_client()
+    if client is None:
+        report["meta"]["skipped"] = "HTTP benchmarks (fastapi.testclient needs httpx)"
+
+    with tempfile.TemporaryDirectory(prefix="expense-bench-") as directory:
+        use_temporary_budgets(directory, seed)
+        for size in sizes:
+            generated_ms, results = bench_size(size, repeat, seed, client)
+            print(f"{size} rows: generated in {generated_ms:.0f} ms", file=sys.stderr)
+            report["results"].extend({"benchmark": name, "rows": size, **stats} for name, stats in results.items())
+        if client is not None:
+            results = bench_processing(repeat, client)
+            report["results"].extend({"benchmark": name, "rows": None, **stats} for name, stats in results.items())
+    report["meta"]["llm_requests"] = fake_llm.requests
+    return report
+
+def compare(report, previous, threshold, min_delta_ms=0.1):
+    """Benchmarks whose median grew by more than `threshold` (and `min_delta_ms`) since `previous`."""
+    before = {(r["benchmark"], r["rows"]): r for r in previous.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = before.get((result["benchmark"], result["rows"]))
+        if old is None or not old["median_ms"]:
+            continue
+        ratio = result["median_ms"] / old["median_ms"]
+        if ratio > 1 + threshold and result["median_ms"] - old["median_ms"] > min_delta_ms:
+            regressions.append({
+                "benchmark": result["benchmark"],
+                "rows": result["rows"],
+                "previous_median_ms": old["median_ms"],
+                "median_ms": result["median_ms"],
+                "ratio": ratio,
+            })
+    return regressions
+
+def print_report(report):
+    print(f"{'rows':>9}  {'benchmark':<28} {'median ms':>10} {'p95 ms':>10} {'min ms':>10} {'runs':>5}")
+    for r in report["results"]:
+        rows = "-" if r["rows"] is None else r["rows"]
+        print(f"{rows:>9}  {r['benchmark']:<28} {r['median_ms']:10.3f} {r['p95_ms']:10.3f} {r['min_ms']:10.3f} {r['runs']:>5}")
+    if report["meta"].get("skipped"):
+        print(f"\nskipped: {report['meta']['skipped']}")
+    for r in report.get("regressions", []):
+        print(f"REGRESSION {r['benchmark']} ({r['rows']} rows): "
+              f"{r['previous_median_ms']:.3f} -> {r['median_ms']:.3f} ms ({r['ratio']:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated row counts (e.g. 1000,100000,1000000)")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per benchmark")
+    parser.add_argument("--seed", type=int, default=42, help="seed for the synthetic data")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="simulated OpenRouter response time")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="JSON report of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed median slowdown before a regression (0.25 = 25%%)")
+    parser.add_argument("--json", action="store_true", help="print the JSON report instead of a table")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    if not sizes or min(sizes) < 1 or args.repeat < 1:
+        parser.error("--sizes and --repeat must be positive")
+
+    # Per-row parse warnings and slow-request logs would swamp the output (configured
+    # before the services' own basicConfig calls, which then do nothing)
+    logging.basicConfig(level=logging.ERROR)
+
+    report = run(sizes, args.repeat, args.seed, args.llm_latency_ms)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    if report.get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
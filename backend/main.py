@@ -1,12 +1,55 @@
-from fastapi import FastAPI, UploadFile, File, Form
+from fastapi import FastAPI, UploadFile, File, Form, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from services.processing import process_text_content, process_audio_content, process_image_content
-from services.sheets import add_transaction_to_sheet
-
+from services.processing import stream_text_content, stream_llm_response, build_image_request
+from services.processing import process_batch, iter_batch
+from services.uploads import UploadLimitMiddleware
+from services.metrics import MetricsMiddleware
+from services import metrics
+from services.sheets import add_transactions_to_sheet, get_worksheet
+from services.concurrency import run_blocking
+from services.store import start_background_sync, stop_background_sync
+from contextlib import asynccontextmanager
+
+import json
+import logging
 import os
 
-app = FastAPI(title="Multi-Modal Expense Tracker")
+logger = logging.getLogger(__name__)
+
+# Heavy services (openai, gspread, the sheet snapshot) load on first use so a cold start
+# only pays for FastAPI. Long-running servers can preload them instead.
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+def warmup():
+    """Preload the Sheets client, transaction snapshot, aggregate index and LLM client."""
+    import time
+    from services.analytics import get_aggregate_index
+    from services.processing import get_client
+    timings = {}
+    for name, step in (("sheets", get_worksheet), ("snapshot", get_aggregate_index), ("llm_client", get_client)):
+        started = time.perf_counter()
+        step()
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"Warmup finished: {timings} (ms)")
+    return timings
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARMUP_ON_STARTUP:
+        await run_blocking(warmup)
+    # Keep the local transaction store reconciled with the sheet in the background
+    start_background_sync()
+    yield
+    stop_background_sync()
+
+app = FastAPI(title="Multi-Modal Expense Tracker", lifespan=lifespan)
+
+# Reject oversized uploads before their body is read (added first so CORS wraps the 413)
+app.add_middleware(UploadLimitMiddleware)
 
 # CORS setup for frontend
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173").split(",")
@@ -18,6 +61,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so request timings include the other middleware and rejected uploads
+app.add_middleware(MetricsMiddleware)
+
 class Transaction(BaseModel):
     transaction_type: str  # 'income', 'expense', or 'savings'
     date: str
@@ -35,91 +81,162 @@ class Transaction(BaseModel):
 def read_root():
     return {"message": "Expense Tracker API is running"}
 
+@app.get("/api/warmup")
+async def warmup_endpoint():
+    """Preload heavy services, e.g. from a cron ping after a serverless deploy."""
+    return {"status": "warm", "timings_ms": await run_blocking(warmup)}
+
 @app.post("/api/process/text")
 async def process_text(text: str = Form(...)):
     return await process_text_content(text)
 
 @app.post("/api/process/audio")
 async def process_audio(file: UploadFile = File(...)):
-    content = await file.read()
-    return await process_audio_content(content)
+    return await process_audio_content(file.file)
 
 @app.post("/api/process/image")
 async def process_image(file: UploadFile = File(...)):
-    content = await file.read()
-    return await process_image_content(content)
+    # Passed as the spooled file; it's hashed, downscaled and encoded without a full read
+    return await process_image_content(file.file)
+
+async def _ndjson(events):
+    async for event in events:
+        yield json.dumps(event) + "\n"
+
+@app.post("/api/process/text/stream")
+async def process_text_stream(text: str = Form(...)):
+    """Like /api/process/text, but emits NDJSON events as each transaction is parsed."""
+    return StreamingResponse(_ndjson(stream_text_content(text)), media_type="application/x-ndjson")
+
+@app.post("/api/process/image/stream")
+async def process_image_stream(file: UploadFile = File(...)):
+    """Like /api/process/image, but emits NDJSON events as each transaction is parsed."""
+    # Preprocess before responding, so a bad upload fails the request rather than the stream
+    messages, cache_key = await build_image_request(file.file)
+    return StreamingResponse(_ndjson(stream_llm_response(messages, cache_key)), media_type="application/x-ndjson")
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
+@app.post("/api/process/batch")
+async def process_batch_endpoint(
+    files: List[UploadFile] = File(default=[]),
+    texts: List[str] = Form(default=[]),
+    stream: bool = False
+):
+    """
+    Extract from many images and/or text snippets at once. Returns per-item results in
+    input order (texts first, then files), or with ?stream=true an NDJSON line per item
+    as each finishes.
+    """
+    items = [("text", text, None) for text in texts if text.strip()]
+    items += [("image", file.file, file.filename) for file in files]
+    if not items:
+        raise HTTPException(status_code=400, detail="No files or texts to process.")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_ITEMS} items per batch.")
+
+    if stream:
+        return StreamingResponse(_ndjson(iter_batch(items)), media_type="application/x-ndjson")
+    return {"results": await process_batch(items)}
 
 from services.analytics import calculate_monthly_summary, get_chart_data
 from services.budgets import Budget, get_budgets, add_budget, check_alerts, delete_budget
-from services.categories import EXPENSE_CATEGORIES, INCOME_CATEGORIES, DEFAULT_SAVINGS_CATEGORIES, VAULT_LOCATIONS
 
 @app.get("/api/summary/monthly")
 async def get_monthly_summary(month: int, year: int):
-    return calculate_monthly_summary(month, year)
+    return await run_blocking(calculate_monthly_summary, month, year)
 
 @app.get("/api/summary/charts")
 async def get_charts(month: int, year: int):
-    return get_chart_data(month, year)
+    return await run_blocking(get_chart_data, month, year)
+
+@app.get("/api/dashboard")
+async def get_dashboard_data(month: int, year: int):
+    """Years, overall savings, monthly summary, charts and alerts in one response."""
+    from services.analytics import get_dashboard
+    return await run_blocking(get_dashboard, month, year)
+
+@app.get("/api/summary/range")
+async def get_summary_range(
+    from_: str = Query(..., alias="from"),
+    to: str = Query(...),
+    granularity: str = "month"
+):
+    """Monthly-summary fields for every month/week/day in a range, e.g. ?from=2025-01&to=2025-12."""
+    from services.analytics import get_range_summary
+    try:
+        return await run_blocking(get_range_summary, from_, to, granularity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/summary/available-years")
 async def get_available_years():
     """Get list of unique years from the sheet data."""
-    from services.analytics import get_all_transactions
-    transactions = get_all_transactions()
-    
-    years = set()
-    for t in transactions:
-        year_str = t.get('Year', '')
-        if year_str:
-            try:
-                years.add(int(year_str))
-            except (ValueError, TypeError):
-                continue
-    
-    return {"years": sorted(list(years))}
+    from services.analytics import get_available_years as available_years
+    return {"years": await run_blocking(available_years)}
 
 @app.get("/api/analytics/overall-savings")
 async def get_overall_savings_endpoint():
     from services.analytics import get_overall_savings
-    return get_overall_savings()
+    return await run_blocking(get_overall_savings)
+
+def collect_stats():
+    """Counters kept by the snapshot, local store, LLM cache, image, fast-path and alert services."""
+    from services.snapshot import get_snapshot_stats
+    from services.store import get_store_stats
+    from services.llm_cache import get_cache_stats as get_llm_cache_stats
+    from services.images import get_image_stats
+    from services.processing import get_fast_path_stats
+    from services.alerts import get_alert_stats
+    return {
+        "snapshot": get_snapshot_stats(),
+        "store": get_store_stats(),
+        "llm": get_llm_cache_stats(),
+        "images": get_image_stats(),
+        "fast_path": get_fast_path_stats(),
+        "alerts": get_alert_stats()
+    }
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the transaction snapshot (each miss is one full sheet download)."""
+    return await run_blocking(collect_stats)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Request/span latency histograms and service counters in the Prometheus text format."""
+    stats = await run_blocking(collect_stats)
+    return PlainTextResponse(metrics.render(stats), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/budgets")
 async def list_budgets(month: int = None, year: int = None):
-    return get_budgets(month, year)
+    return await run_blocking(get_budgets, month, year)
 
 @app.post("/api/budgets")
 async def create_budget(budget: Budget):
-    return add_budget(budget)
+    return await run_blocking(add_budget, budget)
 
 @app.delete("/api/budgets/{budget_id}")
 async def remove_budget(budget_id: str):
-    return delete_budget(budget_id)
+    return await run_blocking(delete_budget, budget_id)
 
 @app.get("/api/alerts")
 async def get_alerts(month: int, year: int):
-    return check_alerts(month, year)
+    return await run_blocking(check_alerts, month, year)
 
 from services.categories import load_categories, save_categories, TRANSACTION_TYPES
 
 @app.get("/api/categories")
 async def get_categories():
-    cats = load_categories()
-    return {
-        "expense": cats.get("expense", []),
-        "income": cats.get("income", []),
-        "savings": cats.get("savings", []),
-        "vaults": cats.get("vaults", [])
-    }
+    # Served from the category registry's cached copy
+    return load_categories()
 
 @app.post("/api/categories")
 async def update_categories(categories: dict):
-    save_categories(categories)
+    await run_blocking(save_categories, categories)
     return {"status": "success"}
 
 @app.post("/api/confirm")
 async def confirm_transactions(transactions: list[Transaction]):
-    results = []
-    for t in transactions:
-        res = add_transaction_to_sheet(t)
-        results.append(res)
-    return results
+    # One append_rows call for the whole batch instead of one write per transaction
+    return await run_blocking(add_transactions_to_sheet, transactions)
@@ -1,161 +1,312 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
-import os
+"""
+Schema migrations for the transactions sheet (6-column <-> 12-column layout).
+
+Rows are streamed from the live sheet in chunks of --chunk-size, transformed, and
+written into a staging worksheet; the live sheet is never cleared. When every chunk is
+in, one spreadsheet.batch_update renames the live sheet to a backup and moves the
+staging sheet into its place (first position, original title), so readers see either
+the old sheet or the new one, never a half-written one. Progress is saved to a
+checkpoint file after each chunk, so an interrupted run resumes instead of restarting.
+
+The running API keeps appending to the live sheet meanwhile, and the copy is not atomic
+with those writes. Rows appended during the copy, past the last row copied or into
+blank rows already passed over, are picked up by catch-up passes just before the swap.
+A running API keeps writing to the old sheet until its next worksheet check, so after
+the swap the script waits --settle-seconds and copies over whatever reached the backup
+since. Writes after that still land only in the backup.
+
+Usage: python migrate_sheets.py [migrate|revert] [--chunk-size 1000] [--restart]
+       [--settle-seconds 65]
+"""
+import argparse
 import json
 import logging
+import os
+import time
 from datetime import datetime
+from services.sheets import get_spreadsheet, reset_sheet_client, SHEET_ID, WORKSHEET_CHECK_INTERVAL
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-SCOPE = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
+DEFAULT_CHUNK_SIZE = 1000
+# Catch-up passes before the swap; each one copies only what arrived during the last
+MAX_CATCH_UP_PASSES = 5
+# Long enough for a running API to notice the swap and write to the new sheet
+DEFAULT_SETTLE_SECONDS = WORKSHEET_CHECK_INTERVAL + 5
+# Blank stretches re-read per batch_get call during catch-up
+GAP_BATCH_SIZE = 100
+CHECKPOINT_FILE = os.path.join(os.path.dirname(__file__), "data", "migrate_sheets.checkpoint.json")
+
+# Define new headers
+NEW_HEADERS = [
+    "Timestamp", "Transaction Type", "Date", "Time", "Category/Type",
+    "Amount", "Vault Location", "Description", "Detail/Source/Item",
+    "Attachments", "Secondary Date", "Secondary Time"
 ]
 
-CREDS_FILE = os.path.join(os.path.dirname(__file__), "credentials.json")
-SHEET_ID = os.getenv("SHEET_ID", "1xy1Rl8VNvaUchMVaNzzUQtctfa8IAvtbVuaN5MvkKgY")
+# Original Headers: Date, Amount, Category, Type, Description, Timestamp
+ORIGINAL_HEADERS = ["Date", "Amount", "Category", "Type", "Description", "Timestamp"]
 
-def get_sheet_client():
-    creds_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
-    if creds_json:
-        creds_data = json.loads(creds_json)
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_data, SCOPE)
-    else:
-        if not os.path.exists(CREDS_FILE):
-            logger.error(f"{CREDS_FILE} not found.")
-            return None
-        creds = ServiceAccountCredentials.from_json_keyfile_name(CREDS_FILE, SCOPE)
-    return gspread.authorize(creds)
-
-def migrate():
-    client = get_sheet_client()
-    if not client:
-        return
+def to_new_schema(row):
+    # Old schema: date, amount, category, type, description, timestamp
+    # Match: 0: date, 1: amount, 2: category, 3: type, 4: description, 5: timestamp
+    if len(row) < 5:
+        return None
+
+    old_date = row[0]
+    old_amount = row[1]
+    old_cat = row[2]
+    old_type = row[3].lower() if len(row) > 3 else "expense"
+    old_desc = row[4] if len(row) > 4 else ""
+    old_ts = row[5] if len(row) > 5 else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+    # Map to new schema
+    return [
+        old_ts,         # 1. Timestamp
+        old_type,       # 2. Transaction Type
+        old_date,       # 3. Date
+        "",             # 4. Time
+        old_cat,        # 5. Category/Type
+        old_amount,     # 6. Amount
+        "Other",        # 7. Vault Location
+        old_desc,       # 8. Description
+        old_desc,       # 9. Detail/Source/Item
+        "",             # 10. Attachments
+        "",             # 11. Secondary Date
+        ""              # 12. Secondary Time
+    ]
+
+def to_original_schema(row):
+    # Mapping from 12 columns to 6
+    # Current Schema (12): 1. Timestamp, 2. Transaction Type, 3. Date, 4. Time, 5. Category/Type,
+    # 6. Amount, 7. Vault Location, 8. Description, 9. Detail/Source/Item, 10. Attachments...
+    if len(row) < 9:
+        return None
+
+    ts = row[0]
+    t_type = row[1]
+    date = row[2]
+    cat = row[4]
+    amount = row[5]
+    vault = row[6]
+    desc = row[7]
+    detail = row[8]
+
+    # Augment description
+    desc_parts = [desc]
+    if vault and vault != "Other":
+        desc_parts.append(f"[Vault: {vault}]")
+    if detail and detail != desc:
+        desc_parts.append(f"[Detail: {detail}]")
+    full_desc = " ".join(desc_parts)
+
+    return [date, amount, cat, t_type, full_desc, ts]
+
+def _column_letter(n):
+    from gspread.utils import rowcol_to_a1
+    return rowcol_to_a1(1, n).rstrip("0123456789")
+
+def load_checkpoint(path, name):
     try:
-        spreadsheet = client.open_by_key(SHEET_ID)
-        sheet = spreadsheet.sheet1
-        
-        # Get all records
-        data = sheet.get_all_values()
-        if not data:
-            logger.info("Sheet is empty.")
-            return
-
-        # Backup existing data to a new sheet
-        backup_sheet_name = f"Backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        backup_sheet = spreadsheet.add_worksheet(title=backup_sheet_name, rows=len(data), cols=len(data[0]))
-        backup_sheet.update('A1', data)
-        logger.info(f"Backup created in sheet: {backup_sheet_name}")
-
-        # Define new headers
-        new_headers = [
-            "Timestamp", "Transaction Type", "Date", "Time", "Category/Type", 
-            "Amount", "Vault Location", "Description", "Detail/Source/Item", 
-            "Attachments", "Secondary Date", "Secondary Time"
-        ]
-
-        # Migrate data
-        # Old schema: date, amount, category, type, description, timestamp
-        # Match: 0: date, 1: amount, 2: category, 3: type, 4: description, 5: timestamp
-        
-        new_rows = [new_headers]
-        for row in data[1:]: # Skip old headers
-            if len(row) < 5: continue
-            
-            old_date = row[0]
-            old_amount = row[1]
-            old_cat = row[2]
-            old_type = row[3].lower() if len(row) > 3 else "expense"
-            old_desc = row[4] if len(row) > 4 else ""
-            old_ts = row[5] if len(row) > 5 else datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-            # Map to new schema
-            new_row = [
-                old_ts,         # 1. Timestamp
-                old_type,       # 2. Transaction Type
-                old_date,       # 3. Date
-                "",             # 4. Time
-                old_cat,        # 5. Category/Type
-                old_amount,     # 6. Amount
-                "Other",        # 7. Vault Location
-                old_desc,       # 8. Description
-                old_desc,       # 9. Detail/Source/Item
-                "",             # 10. Attachments
-                "",             # 11. Secondary Date
-                ""              # 12. Secondary Time
-            ]
-            new_rows.append(new_row)
-
-        # Clear original sheet and update with new data
-        sheet.clear()
-        sheet.update('A1', new_rows)
-        logger.info("Migration successful!")
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get("sheet_id") != SHEET_ID or checkpoint.get("migration") != name:
+        logger.warning(f"Ignoring checkpoint for a different sheet or migration ({checkpoint.get('migration')})")
+        return None
+    # Written before catch-up existed: treat everything scanned so far as copied
+    checkpoint.setdefault("last_data_row", checkpoint["next_source_row"] - 1)
+    checkpoint.setdefault("blank_ranges", [])
+    checkpoint.setdefault("swapped", False)
+    return checkpoint
 
-    except Exception as e:
-        logger.error(f"Migration failed: {e}")
+def save_checkpoint(path, checkpoint):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    checkpoint["updated_at"] = datetime.now().isoformat()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+def _start(spreadsheet, source, name, headers):
+    """Create the staging worksheet with its header row and return a fresh checkpoint."""
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    staging = spreadsheet.add_worksheet(
+        title=f"Staging_{name}_{stamp}", rows=max(source.row_count, 2), cols=len(headers)
+    )
+    staging.update([headers], "A1")
+    logger.info(f"Created staging sheet: {staging.title}")
+    return {
+        "sheet_id": SHEET_ID,
+        "migration": name,
+        "source_id": source.id,
+        "source_title": source.title,
+        "staging_id": staging.id,
+        "backup_title": f"Backup_{name}_{stamp}",
+        "next_source_row": 2,  # Skip the source headers
+        "next_staging_row": 2,
+        "rows_written": 0,
+        # Source rows seen so far: the last one holding data, and the blank stretches
+        # ([first, last] row numbers) the API may append into later
+        "last_data_row": 1,
+        "blank_ranges": [],
+        "swapped": False
+    }
 
-def revert():
-    client = get_sheet_client()
-    if not client:
+def _write_staged(staging, rows, checkpoint):
+    if not rows:
+        return
+    if checkpoint["swapped"]:
+        # Staging is the live sheet now and the API appends to it too
+        staging.append_rows(rows)
+    else:
+        # Rewriting the same staging rows after a crash is harmless, so this is safe to repeat
+        staging.update(rows, f"A{checkpoint['next_staging_row']}")
+    checkpoint["next_staging_row"] += len(rows)
+    checkpoint["rows_written"] += len(rows)
+
+def _copy_rows(staging, transform, checkpoint, start, end, chunk, width):
+    """Stage the non-blank rows of `chunk` (source rows start..end) and note the blank ones."""
+    rows = []
+    blank_ranges = checkpoint["blank_ranges"]
+    for row_num in range(start, end + 1):
+        row = chunk[row_num - start] if row_num - start < len(chunk) else []
+        if not any(str(c).strip() for c in row):
+            if blank_ranges and blank_ranges[-1][1] == row_num - 1:
+                blank_ranges[-1][1] = row_num
+            else:
+                blank_ranges.append([row_num, row_num])
+            continue
+        # The API leaves out trailing empty cells (get_all_values padded them), which
+        # would make rows with empty trailing columns look too short to transform
+        rows.append(list(row) + [""] * (width - len(row)))
+        checkpoint["last_data_row"] = max(checkpoint["last_data_row"], row_num)
+    _write_staged(staging, [r for r in (transform(row) for row in rows) if r is not None], checkpoint)
+
+def _copy_chunks(source, staging, transform, checkpoint, checkpoint_path, chunk_size):
+    """Stream source rows into staging chunk by chunk, saving progress after each."""
+    width = max(source.col_count, 1)
+    last_column = _column_letter(width)
+    # Walk the whole grid: a blank stretch in the middle doesn't mean the data has ended
+    while checkpoint["next_source_row"] <= source.row_count:
+        start = checkpoint["next_source_row"]
+        end = min(start + chunk_size - 1, source.row_count)
+        chunk = source.get(f"A{start}:{last_column}{end}")
+        _copy_rows(staging, transform, checkpoint, start, end, chunk, width)
+        checkpoint["next_source_row"] = end + 1
+        save_checkpoint(checkpoint_path, checkpoint)
+        logger.info(f"Copied source rows {start}-{end} ({checkpoint['rows_written']} rows staged)")
+
+def _catch_up(spreadsheet, staging, transform, checkpoint, checkpoint_path, chunk_size):
+    """
+    Copy rows appended to the source since they were scanned: into blank rows already
+    passed over, or after the last row copied (possibly beyond the original grid).
+    Returns the number of rows added to staging.
+    """
+    before = checkpoint["rows_written"]
+    # A fresh handle: row_count is grid metadata, cached when the worksheet was fetched
+    source = spreadsheet.get_worksheet_by_id(checkpoint["source_id"])
+    width = max(source.col_count, 1)
+    last_column = _column_letter(width)
+
+    last_data_row = checkpoint["last_data_row"]
+    gaps = [[first, min(last, last_data_row)] for first, last in checkpoint["blank_ranges"] if first <= last_data_row]
+    checkpoint["blank_ranges"] = []
+    for offset in range(0, len(gaps), GAP_BATCH_SIZE):
+        batch = gaps[offset:offset + GAP_BATCH_SIZE]
+        chunks = source.batch_get([f"A{first}:{last_column}{last}" for first, last in batch])
+        for (first, last), chunk in zip(batch, chunks):
+            _copy_rows(staging, transform, checkpoint, first, last, chunk, width)
+        save_checkpoint(checkpoint_path, checkpoint)
+
+    # Blank rows past the last data row are read again as part of the tail
+    checkpoint["next_source_row"] = last_data_row + 1
+    _copy_chunks(source, staging, transform, checkpoint, checkpoint_path, chunk_size)
+    save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint["rows_written"] - before
+
+def _swap(spreadsheet, checkpoint):
+    """Atomically rename the live sheet to the backup title and put staging in its place."""
+    spreadsheet.batch_update({"requests": [
+        {"updateSheetProperties": {
+            "properties": {"sheetId": checkpoint["source_id"], "title": checkpoint["backup_title"]},
+            "fields": "title"
+        }},
+        {"updateSheetProperties": {
+            "properties": {"sheetId": checkpoint["staging_id"], "title": checkpoint["source_title"], "index": 0},
+            "fields": "title,index"
+        }}
+    ]})
+
+def run_migration(name, headers, transform, chunk_size=DEFAULT_CHUNK_SIZE, checkpoint_path=CHECKPOINT_FILE, restart=False,
+                  settle_seconds=DEFAULT_SETTLE_SECONDS):
+    spreadsheet = get_spreadsheet()
+    if not spreadsheet:
         return
 
     try:
-        spreadsheet = client.open_by_key(SHEET_ID)
-        sheet = spreadsheet.sheet1
-        
-        # Get all records
-        data = sheet.get_all_values()
-        if not data:
-            logger.info("Sheet is empty.")
-            return
-
-        # Backup existing data
-        backup_sheet_name = f"Backup_Before_Revert_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        backup_sheet = spreadsheet.add_worksheet(title=backup_sheet_name, rows=len(data), cols=len(data[0]))
-        backup_sheet.update('A1', data)
-        logger.info(f"Backup created in sheet: {backup_sheet_name}")
-
-        # Original Headers: Date, Amount, Category, Type, Description, Timestamp
-        original_headers = ["Date", "Amount", "Category", "Type", "Description", "Timestamp"]
-        
-        # Mapping from 12 columns to 6
-        # Current Schema (12): 1. Timestamp, 2. Transaction Type, 3. Date, 4. Time, 5. Category/Type, 
-        # 6. Amount, 7. Vault Location, 8. Description, 9. Detail/Source/Item, 10. Attachments...
-        
-        new_rows = [original_headers]
-        for row in data[1:]: # Skip current headers
-            if len(row) < 9: continue
-            
-            ts = row[0]
-            t_type = row[1]
-            date = row[2]
-            cat = row[4]
-            amount = row[5]
-            vault = row[6]
-            desc = row[7]
-            detail = row[8]
-            
-            # Augment description
-            desc_parts = [desc]
-            if vault and vault != "Other":
-                desc_parts.append(f"[Vault: {vault}]")
-            if detail and detail != desc:
-                desc_parts.append(f"[Detail: {detail}]")
-            full_desc = " ".join(desc_parts)
-
-            new_row = [date, amount, cat, t_type, full_desc, ts]
-            new_rows.append(new_row)
-
-        # Clear original sheet and update
-        sheet.clear()
-        sheet.update('A1', new_rows)
-        logger.info("Revert migration successful!")
+        checkpoint = None if restart else load_checkpoint(checkpoint_path, name)
+        if checkpoint:
+            source = spreadsheet.get_worksheet_by_id(checkpoint["source_id"])
+            staging = spreadsheet.get_worksheet_by_id(checkpoint["staging_id"])
+            logger.info(f"Resuming {name} at source row {checkpoint['next_source_row']} ({checkpoint['rows_written']} rows staged)")
+        else:
+            source = spreadsheet.sheet1
+            if not source.get("A1:A2"):
+                logger.info("Sheet is empty.")
+                return
+            checkpoint = _start(spreadsheet, source, name, headers)
+            staging = spreadsheet.get_worksheet_by_id(checkpoint["staging_id"])
+            save_checkpoint(checkpoint_path, checkpoint)
+
+        if not checkpoint["swapped"]:
+            _copy_chunks(source, staging, transform, checkpoint, checkpoint_path, chunk_size)
+            # Rows the API appended while we copied; stop once a pass finds nothing new
+            for _ in range(MAX_CATCH_UP_PASSES):
+                added = _catch_up(spreadsheet, staging, transform, checkpoint, checkpoint_path, chunk_size)
+                if not added:
+                    break
+                logger.info(f"Caught up {added} rows appended during the copy")
+
+            _swap(spreadsheet, checkpoint)
+            checkpoint["swapped"] = True
+            save_checkpoint(checkpoint_path, checkpoint)
+            # Cached handles in this process still point at the old first worksheet
+            reset_sheet_client()
+
+        if settle_seconds > 0:
+            logger.info(f"Waiting {settle_seconds:.0f}s for running APIs to switch to the new sheet")
+            time.sleep(settle_seconds)
+        added = _catch_up(spreadsheet, staging, transform, checkpoint, checkpoint_path, chunk_size)
+        if added:
+            logger.info(f"Copied {added} rows written to the old sheet after the swap")
+
+        os.remove(checkpoint_path)
+        logger.info(f"Backup kept in sheet: {checkpoint['backup_title']}")
+        logger.info(f"{name} successful! Rows written to the backup from now on are not copied.")
 
     except Exception as e:
-        logger.error(f"Revert failed: {e}")
+        logger.error(f"{name} failed: {e}. Run again to resume from the last completed chunk.")
+
+def migrate(chunk_size=DEFAULT_CHUNK_SIZE, restart=False, settle_seconds=DEFAULT_SETTLE_SECONDS):
+    run_migration("Migration", NEW_HEADERS, to_new_schema, chunk_size, restart=restart, settle_seconds=settle_seconds)
+
+def revert(chunk_size=DEFAULT_CHUNK_SIZE, restart=False, settle_seconds=DEFAULT_SETTLE_SECONDS):
+    run_migration("Revert", ORIGINAL_HEADERS, to_original_schema, chunk_size, restart=restart, settle_seconds=settle_seconds)
 
 if __name__ == "__main__":
-    revert()
+    parser = argparse.ArgumentParser(description="Migrate the transactions sheet between schemas.")
+    parser.add_argument("command", nargs="?", default="revert", choices=["migrate", "revert"])
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows read and written per call")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start a new staging sheet")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="wait after the swap before copying rows still written to the old sheet")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate(args.chunk_size, args.restart, args.settle_seconds)
+    else:
+        revert(args.chunk_size, args.restart, args.settle_seconds)
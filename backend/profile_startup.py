@@ -0,0 +1,99 @@
+"""
+Report how much of a cold start is spent importing modules.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter, compares it with a
+bare `import fastapi`, lists the slowest modules and which heavy dependencies were
+pulled in at import time. With --requests it also times the first `/` and
+`/api/categories` requests in a fresh process (needs httpx for TestClient).
+
+Usage: python profile_startup.py [--top 15] [--requests] [--json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ["openai", "gspread", "oauth2client", "numpy", "PIL"]
+
+FIRST_REQUEST_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+timings = {"import_ms": (imported - started) * 1000}
+for path in ("/", "/api/categories"):
+    t = time.perf_counter()
+    client.get(path)
+    timings[path] = (time.perf_counter() - t) * 1000
+print(json.dumps(timings))
+"""
+
+def _run(args):
+    return subprocess.run([sys.executable] + args, cwd=BACKEND_DIR, capture_output=True, text=True)
+
+def import_times(statement):
+    """{module: (self_us, cumulative_us)} for a fresh interpreter running `statement`."""
+    result = _run(["-X", "importtime", "-c", statement])
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "import failed")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if not parts[0].isdigit():
+            continue  # header line
+        times[parts[2].strip()] = (int(parts[0]), int(parts[1]))
+    return times
+
+def first_request_times():
+    result = _run(["-c", FIRST_REQUEST_SCRIPT])
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1] if result.stderr else "failed"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def profile(top: int, requests: bool):
+    app_times = import_times("import main")
+    baseline = import_times("import fastapi")
+    report = {
+        "import_main_ms": app_times.get("main", (0, 0))[1] / 1000,
+        "import_fastapi_ms": baseline.get("fastapi", (0, 0))[1] / 1000,
+        "heavy_modules_loaded": [m for m in HEAVY_MODULES if m in app_times],
+        "slowest_modules": [
+            {"module": name, "self_ms": s / 1000, "cumulative_ms": c / 1000}
+            for name, (s, c) in sorted(app_times.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        ],
+    }
+    if requests:
+        report["first_requests_ms"] = first_request_times()
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest modules to list")
+    parser.add_argument("--requests", action="store_true", help="also time the first / and /api/categories requests")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    report = profile(args.top, args.requests)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"import main:    {report['import_main_ms']:8.1f} ms")
+    print(f"import fastapi: {report['import_fastapi_ms']:8.1f} ms (baseline)")
+    print(f"heavy modules loaded at import: {', '.join(report['heavy_modules_loaded']) or 'none'}")
+    print("\nslowest modules (cumulative):")
+    for m in report["slowest_modules"]:
+        print(f"  {m['cumulative_ms']:8.1f} ms  {m['self_ms']:8.1f} ms self  {m['module']}")
+    if "first_requests_ms" in report:
+        print("\nfirst requests:")
+        for path, ms in report["first_requests_ms"].items():
+            print(f"  {path}: {ms if isinstance(ms, str) else f'{ms:.1f} ms'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# backend/services/aggregates.py
+"""
+Single-pass aggregate index over the transaction snapshot.
+
+Every row is parsed once (Year, Amount, Date) and folded into per-(year, month) buckets,
+so the summary, chart, savings and available-years endpoints become dictionary lookups.
+The index is rebuilt only when the snapshot or the savings categories change; rows
+written through to the snapshot are folded in without a rebuild.
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_KINDS = ("income", "expense", "savings")
+
+def parse_date(date_str):
+    """Robust date parsing for multiple formats."""
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+def parse_amount(value):
+    # Remove apostrophes that Google Sheets adds to text-formatted numbers
+    return float(str(value).lstrip("'"))
+
+def month_name(month: int, year: int):
+    return datetime(year, month, 1).strftime("%B")
+
+def new_bucket():
+    return {
+        "income": 0,
+        "expense": 0,
+        "savings": 0,
+        "income_breakdown": {},
+        "expense_breakdown": {},
+        "savings_breakdown": {},
+        "daily": {}
+    }
+
+def accumulate(bucket, t_type, cat, amount, savings_categories):
+    """Fold one transaction into a bucket's type totals and category breakdowns."""
+    if t_type == 'income':
+        bucket["income"] += amount
+        breakdown = bucket["income_breakdown"]
+        breakdown[cat] = breakdown.get(cat, 0) + amount
+    elif t_type == 'expense':
+        # Check if this expense is actually spending from a Savings Fund
+        if cat in savings_categories:
+            # Subtract from savings instead of adding to expense
+            bucket["savings"] -= amount
+            breakdown = bucket["savings_breakdown"]
+            breakdown[cat] = breakdown.get(cat, 0) - amount
+        else:
+            bucket["expense"] += amount
+            breakdown = bucket["expense_breakdown"]
+            breakdown[cat] = breakdown.get(cat, 0) + amount
+    elif t_type == 'savings':
+        bucket["savings"] += amount
+        breakdown = bucket["savings_breakdown"]
+        breakdown[cat] = breakdown.get(cat, 0) + amount
+
+def summarize_bucket(bucket, month: int, year: int):
+    """The calculate_monthly_summary response shape for a bucket."""
+    income, expense, savings = bucket["income"], bucket["expense"], bucket["savings"]
+    return {
+        "month": month,
+        "year": year,
+        "total_income": income,
+        "total_expense": expense,
+        "total_savings": savings,
+        "net_balance": income - expense - savings,
+        "income_breakdown": dict(bucket["income_breakdown"]),
+        "expense_breakdown": dict(bucket["expense_breakdown"]),
+        "savings_breakdown": dict(bucket["savings_breakdown"])
+    }
+
+class AggregateIndex:
+    """
+    Totals keyed by (year, month name) plus all-time savings.
+
+    `savings_categories` drives the net-savings logic of the monthly views (expenses from a
+    savings fund are withdrawals); `overall_savings_categories` does the same for the
+    all-time savings total.
+    """
+
+    def __init__(self, savings_categories, overall_savings_categories):
+        self.savings_categories = frozenset(savings_categories)
+        self.overall_savings_categories = frozenset(overall_savings_categories)
+        self.months = {}
+        self.years = set()
+        self.overall_total = 0
+        self.overall_breakdown = {}
+        self.row_count = 0
+        self._last_row = None
+        # Guards folding in appended rows while another request reads
+        self._lock = threading.RLock()
+
+    def add_all(self, transactions):
+        with self._lock:
+            for t in transactions:
+                self.add(t)
+
+    def add(self, t):
+        self.row_count += 1
+        self._last_row = t
+
+        try:
+            amount = parse_amount(t.get('Amount', 0))
+        except (ValueError, TypeError):
+            amount = None
+
+        t_type = t.get('Type', '').strip().lower()
+        if amount is not None:
+            self._add_overall(t, t_type, amount)
+
+        # Use Year and Month columns for the monthly views
+        t_year = t.get('Year', '')
+        try:
+            t_year_int = int(t_year) if t_year else 0
+        except (ValueError, TypeError):
+            return
+        if t_year:
+            self.years.add(t_year_int)
+
+        if amount is None:
+            logger.warning(f"Error processing row for summary: could not parse amount {t.get('Amount')!r}")
+            return
+
+        key = (t_year_int, t.get('Month', ''))
+        bucket = self.months.get(key)
+        if bucket is None:
+            bucket = self.months[key] = new_bucket()
+
+        cat = t['Category']
+        accumulate(bucket, t_type, cat, amount, self.savings_categories)
+
+        # Chart buckets need a parseable date for the day of month
+        t_date = parse_date(t['Date'])
+        if not t_date:
+            return
+        day = t_date.day
+        daily = bucket["daily"].get(day)
+        if daily is None:
+            daily = bucket["daily"][day] = {"day": day, "income": 0, "expense": 0, "savings": 0}
+
+        # Apply same Net Logic to Chart Data
+        if t_type == 'expense' and cat in self.savings_categories:
+            daily['savings'] -= amount
+        elif t_type in TRANSACTION_KINDS:
+            daily[t_type] += amount
+
+    def _add_overall(self, t, t_type, amount):
+        category = t.get('Category', '').strip()
+        is_savings_cat = category in self.overall_savings_categories
+
+        if t_type == 'savings':
+            self.overall_total += amount
+            self.overall_breakdown[category] = self.overall_breakdown.get(category, 0) + amount
+        elif t_type == 'expense' and is_savings_cat:
+            self.overall_total -= amount
+            self.overall_breakdown[category] = self.overall_breakdown.get(category, 0) - amount
+        elif t_type == 'income' and is_savings_cat:
+            # Theoretical case: Income directly into a savings fund
+            self.overall_total += amount
+            self.overall_breakdown[category] = self.overall_breakdown.get(category, 0) + amount
+
+    def continues(self, transactions):
+        """True if `transactions` is the indexed list plus rows appended after it."""
+        if len(transactions) < self.row_count:
+            return False
+        if self.row_count == 0:
+            return True
+        return transactions[self.row_count - 1] is self._last_row
+
+    def monthly_summary(self, month: int, year: int):
+        with self._lock:
+            bucket = self.months.get((year, month_name(month, year))) or new_bucket()
+            return summarize_bucket(bucket, month, year)
+
+    def chart_data(self, month: int, year: int):
+        with self._lock:
+            bucket = self.months.get((year, month_name(month, year)))
+            if not bucket:
+                return []
+            daily = bucket["daily"]
+            return [dict(daily[d]) for d in sorted(daily.keys())]
+
+    def overall_savings(self):
+        with self._lock:
+            # Filter out zero balances for the chart
+            breakdown = {k: v for k, v in self.overall_breakdown.items() if v != 0}
+            return {
+                "total_overall_savings": self.overall_total,
+                "savings_breakdown": breakdown
+            }
+
+    def available_years(self):
+        with self._lock:
+            return sorted(self.years)
+
+# Histories at least this long are indexed with the NumPy engine (when numpy is installed)
+VECTORIZED_MIN_ROWS = int(os.getenv("VECTORIZED_MIN_ROWS", "20000"))
+
+_lock = threading.Lock()
+_index = None
+
+def _build(transactions, savings_categories, overall_savings_categories):
+    if len(transactions) >= VECTORIZED_MIN_ROWS:
+        try:
+            from services.vectorized import build_index
+        except ImportError:
+            logger.info("numpy not installed; indexing row by row.")
+        else:
+            return build_index(transactions, savings_categories, overall_savings_categories)
+
+    index = AggregateIndex(savings_categories, overall_savings_categories)
+    index.add_all(transactions)
+    return index
+
+def invalidate_index():
+    global _index
+    with _lock:
+        _index = None
+
+def get_index(transactions, savings_categories, overall_savings_categories):
+    """
+    Return the aggregate index for `transactions`, reusing the cached one when the
+    snapshot and categories are unchanged and folding in rows appended since.
+    """
+    global _index
+    savings_categories = frozenset(savings_categories)
+    overall_savings_categories = frozenset(overall_savings_categories)
+    with _lock:
+        index = _index
+        if (index is None
+                or index.savings_categories != savings_categories
+                or index.overall_savings_categories != overall_savings_categories
+                or not index.continues(transactions)):
+            index = _build(transactions, savings_categories, overall_savings_categories)
+            _index = index
+        elif len(transactions) > index.row_count:
+            index.add_all(transactions[index.row_count:])
+        return index
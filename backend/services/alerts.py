@@ -0,0 +1,153 @@
+# backend/services/alerts.py
+"""
+Incremental budget alerts.
+
+Each month that has been asked about keeps its own copy of the month's expense/savings
+breakdowns (seeded from the aggregate index) and the alert entry of every budget in it.
+Rows written by /api/confirm are folded into those running counters and only the
+budgets for the affected (category, month, year) are re-evaluated, so reading alerts is
+a dictionary lookup. A month is re-seeded from the index after SNAPSHOT_TTL_SECONDS, so
+edits made directly in the sheet reach its alerts once the snapshot has reloaded them
+(on the next refresh when the spreadsheet's modifiedTime shows a change that isn't an
+append, at the latest after SHEETS_FULL_RELOAD_INTERVAL). All months are dropped when
+the budgets or categories change.
+"""
+import logging
+import threading
+import time
+
+from services.aggregates import accumulate, month_name, new_bucket, parse_amount
+from services.budgets import budget_alert, combined_spending, get_repository
+from services.categories import get_categories
+from services.snapshot import SNAPSHOT_TTL
+
+logger = logging.getLogger(__name__)
+
+# Statuses that mean a budget needs attention; moving into one of them is a crossing
+ALERT_STATUSES = ("warning", "critical", "success")
+
+# The sheet's Month column holds full month names (as written by build_transaction_row)
+MONTH_NUMBERS = {month_name(m, 2000): m for m in range(1, 13)}
+
+_lock = threading.RLock()
+_periods = {}
+_state = None
+_stats = {"reads": 0, "seeds": 0, "rows_applied": 0, "crossings": 0}
+
+def _current_state():
+    return (get_repository().current_version(), get_categories().version)
+
+def _check_state():
+    """Drop every seeded month when budgets or categories have changed."""
+    global _state
+    state = _current_state()
+    if state != _state:
+        _periods.clear()
+        _state = state
+
+def _seed(year: int, month: int):
+    from services.analytics import get_aggregate_index
+    summary = get_aggregate_index().monthly_summary(month, year)
+    bucket = new_bucket()
+    bucket["expense_breakdown"] = dict(summary.get("expense_breakdown", {}))
+    bucket["savings_breakdown"] = dict(summary.get("savings_breakdown", {}))
+
+    savings_categories = get_categories().savings_set
+    spending = combined_spending(bucket)
+    budgets = get_repository().for_period(month, year)
+    period = {
+        "bucket": bucket,
+        "budgets": budgets,
+        "alerts": [budget_alert(b, spending.get(b['category'], 0), savings_categories) for b in budgets],
+        "seeded_at": time.monotonic()
+    }
+    _periods[(year, month)] = period
+    _stats["seeds"] += 1
+    return period
+
+def _period(year: int, month: int):
+    period = _periods.get((year, month))
+    if period is None or time.monotonic() - period["seeded_at"] > SNAPSHOT_TTL:
+        period = _seed(year, month)
+    return period
+
+def get_alerts(month: int, year: int):
+    """check_alerts() output for a month, from the running counters."""
+    with _lock:
+        _check_state()
+        _stats["reads"] += 1
+        return [dict(a) for a in _period(year, month)["alerts"]]
+
+def _row_period(row):
+    """(year, month number) from an 8-column sheet row's Year/Month columns, or None."""
+    try:
+        year = int(row[6])
+    except (ValueError, TypeError, IndexError):
+        return None
+    month = MONTH_NUMBERS.get(str(row[7]))
+    return (year, month) if month else None
+
+def prepare_rows(rows):
+    """
+    Seed the months `rows` fall in before they are written, so apply_rows can report
+    which budgets the write pushes over a threshold. Errors are logged, not raised.
+    """
+    try:
+        with _lock:
+            _check_state()
+            for period in {p for p in map(_row_period, rows) if p}:
+                _period(*period)
+    except Exception as e:
+        logger.warning(f"Could not prepare budget alerts: {e}")
+
+def apply_rows(rows):
+    """
+    Fold rows just appended to the sheet into the counters of already-seeded months.
+    Returns, per row, the alerts whose budget moved into warning/critical/success
+    because of this write (each with its previous status).
+    """
+    crossings = [[] for _ in rows]
+    with _lock:
+        _check_state()
+        savings_categories = get_categories().savings_set
+        touched = {}
+        for i, row in enumerate(rows):
+            period_key = _row_period(row)
+            period = _periods.get(period_key) if period_key else None
+            if period is None:
+                # Not seeded: the next read seeds it from the index, which already has the row
+                continue
+            try:
+                amount = parse_amount(row[1])
+            except (ValueError, TypeError):
+                continue
+            accumulate(period["bucket"], str(row[3]).strip().lower(), row[2], amount, savings_categories)
+            touched.setdefault(period_key, set()).add(row[2])
+            _stats["rows_applied"] += 1
+
+        changed = {}
+        for (year, month), categories in touched.items():
+            period = _periods[(year, month)]
+            spending = combined_spending(period["bucket"])
+            for j, b in enumerate(period["budgets"]):
+                if b['category'] not in categories:
+                    continue
+                previous = period["alerts"][j]
+                alert = budget_alert(b, spending.get(b['category'], 0), savings_categories)
+                period["alerts"][j] = alert
+                if alert["status"] != previous["status"] and alert["status"] in ALERT_STATUSES:
+                    changed[(b['category'], year, month)] = {
+                        **alert, "month": month, "year": year, "previous_status": previous["status"]
+                    }
+
+        for i, row in enumerate(rows):
+            period_key = _row_period(row)
+            crossing = changed.get((row[2],) + period_key) if period_key else None
+            if crossing is not None:
+                crossings[i].append(dict(crossing))
+        _stats["crossings"] += len(changed)
+    return crossings
+
+def get_alert_stats():
+    with _lock:
+        return {**_stats, "seeded_months": len(_periods)}
@@ -1,214 +1,182 @@
 # backend/services/analytics.py
-from services.sheets import get_sheet_client, SHEET_ID
+from services.snapshot import get_transactions
+from services.categories import get_categories, get_registry
+from services.metrics import timed
+from services.aggregates import invalidate_index, get_index, parse_date, parse_amount, accumulate, summarize_bucket, new_bucket
+from datetime import date, datetime, timedelta
+import calendar
 import logging
-from datetime import datetime
+import os
 
 logger = logging.getLogger(__name__)
 
+# Drop the aggregate index as soon as the categories change instead of on the next read
+get_registry().subscribe(lambda categories: invalidate_index())
+
+@timed()
 def get_all_transactions():
-    client = get_sheet_client()
-    if not client:
-        return []
-    
-    try:
-        sheet = client.open_by_key(SHEET_ID).sheet1
-        data = sheet.get_all_values()
-        if not data:
-            return []
-        
-        # Updated Schema (8 cols): Date, Amount, Category, Type, Description, Timestamp, Year, Month
-        headers = data[0]
-        rows = data[1:]
-        
-        # Mapping index based on headers to be safe
-        header_map = {h.strip(): i for i, h in enumerate(headers)}
-        
-        transactions = []
-        for row in rows:
-            if len(row) < 4: continue
-            transactions.append({
-                "Date": row[header_map.get("Date", 0)],
-                "Amount": row[header_map.get("Amount", 1)],
-                "Category": row[header_map.get("Category", 2)],
-                "Type": row[header_map.get("Type", 3)],
-                "Description": row[header_map.get("Description", 4)] if "Description" in header_map else "",
-                "Year": row[header_map.get("Year", 6)] if "Year" in header_map and len(row) > 6 else "",
-                "Month": row[header_map.get("Month", 7)] if "Month" in header_map and len(row) > 7 else ""
-            })
-        return transactions
-    except Exception as e:
-        logger.error(f"Error fetching transactions for analytics: {e}")
-        return []
-
-def parse_date(date_str):
-    """Robust date parsing for multiple formats."""
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y"):
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-    return None
+    # Served from the shared snapshot; the sheet is only downloaded when the TTL expires
+    return get_transactions()
 
-def calculate_monthly_summary(month: int, year: int):
+@timed()
+def get_aggregate_index():
+    """Aggregate index for the current snapshot (rebuilt only when data or categories change)."""
     transactions = get_all_transactions()
-    
-    # Import categories dynamically to handle user-defined ones
-    from services.categories import load_categories
-    all_cats = load_categories()
-    savings_cat_list = all_cats.get("savings", [])
-    
-    # Convert month number to month name
-    month_name = datetime(year, month, 1).strftime("%B")
-    
-    income = 0
-    expense = 0
-    savings = 0
-    income_categories = {}
-    expense_categories = {}
-    savings_categories = {}
-
-    for t in transactions:
-        try:
-            # Use Year and Month columns for filtering
-            t_year = t.get('Year', '')
-            t_month = t.get('Month', '')
-            
-            # Convert year to int for comparison
-            try:
-                t_year_int = int(t_year) if t_year else 0
-            except (ValueError, TypeError):
-                continue
-            
-            if t_year_int == year and t_month == month_name:
-                t_type = t['Type'].strip().lower()
-                # Remove apostrophes that Google Sheets adds to text-formatted numbers
-                amount_str = str(t['Amount']).lstrip("'")
-                amount = float(amount_str)
-                cat = t['Category']
-
-                if t_type == 'income':
-                    income += amount
-                    income_categories[cat] = income_categories.get(cat, 0) + amount
-                elif t_type == 'expense':
-                    # Check if this expense is actually spending from a Savings Fund
-                    if cat in savings_cat_list:
-                        # Subtract from savings instead of adding to expense
-                        savings -= amount
-                        savings_categories[cat] = savings_categories.get(cat, 0) - amount
-                    else:
-                        expense += amount
-                        expense_categories[cat] = expense_categories.get(cat, 0) + amount
-                elif t_type == 'savings':
-                    savings += amount
-                    savings_categories[cat] = savings_categories.get(cat, 0) + amount
-        except Exception as e:
-            logger.warning(f"Error processing row for summary: {e}")
-            continue
 
+    # Current categories from the registry (no file read); all-time savings use the same list
+    savings = get_categories().savings_set
+    return get_index(transactions, savings, savings)
+
+@timed()
+def calculate_monthly_summary(month: int, year: int):
+    return get_aggregate_index().monthly_summary(month, year)
+
+@timed()
+def get_chart_data(month: int, year: int):
+    return get_aggregate_index().chart_data(month, year)
+
+@timed()
+def get_overall_savings():
+    """
+    Calculate total overall savings across all time.
+    Subtracts expenses made from savings categories (e.g. spending from Investment Fund).
+    """
+    return get_aggregate_index().overall_savings()
+
+@timed()
+def get_available_years():
+    """Unique years present in the sheet's Year column."""
+    return get_aggregate_index().available_years()
+
+@timed()
+def get_dashboard(month: int, year: int):
+    """Everything the dashboard shows for a month, computed from one snapshot/index load."""
+    from services.budgets import check_alerts
+    index = get_aggregate_index()
+    summary = index.monthly_summary(month, year)
     return {
         "month": month,
         "year": year,
-        "total_income": income,
-        "total_expense": expense,
-        "total_savings": savings,
-        "net_balance": income - expense - savings,
-        "income_breakdown": income_categories,
-        "expense_breakdown": expense_categories,
-        "savings_breakdown": savings_categories
+        "years": index.available_years(),
+        "overall_savings": index.overall_savings(),
+        "summary": summary,
+        "charts": index.chart_data(month, year),
+        "alerts": check_alerts(month, year, summary=summary)
     }
 
-def get_chart_data(month: int, year: int):
-    transactions = get_all_transactions()
-    
-    # Import categories dynamically
-    from services.categories import load_categories
-    all_cats = load_categories()
-    savings_cat_list = all_cats.get("savings", [])
-    
-    # Convert month number to month name
-    month_name = datetime(year, month, 1).strftime("%B")
-    
-    daily_data = {}
-    
-    for t in transactions:
-        try:
-            # Use Year and Month columns for filtering
-            t_year = t.get('Year', '')
-            t_month = t.get('Month', '')
-            
-            try:
-                t_year_int = int(t_year) if t_year else 0
-            except (ValueError, TypeError):
-                continue
-
-            if t_year_int == year and t_month == month_name:
-                # Parse date to get the day
-                t_date = parse_date(t['Date'])
-                if not t_date: continue
-                
-                day = t_date.day
-                t_type = t['Type'].strip().lower()
-                # Remove apostrophes that Google Sheets adds to text-formatted numbers
-                amount_str = str(t['Amount']).lstrip("'")
-                amount = float(amount_str)
-                cat = t['Category']
-                
-                if day not in daily_data:
-                    daily_data[day] = {"day": day, "income": 0, "expense": 0, "savings": 0}
-                
-                # Apply same Net Logic to Chart Data
-                if t_type == 'expense' and cat in savings_cat_list:
-                     daily_data[day]['savings'] -= amount
-                elif t_type in daily_data[day]:
-                    daily_data[day][t_type] += amount
-        except Exception:
-            continue
-            
-    result = [daily_data[d] for d in sorted(daily_data.keys())]
-    return result
+RANGE_GRANULARITIES = ("month", "week", "day")
+MAX_RANGE_PERIODS = int(os.getenv("MAX_RANGE_PERIODS", "1000"))
+
+def parse_year_month(value: str):
+    """Parse 'YYYY-MM' into (year, month)."""
+    try:
+        parsed = datetime.strptime(value.strip(), "%Y-%m")
+    except ValueError:
+        raise ValueError(f"Expected YYYY-MM, got {value!r}")
+    return parsed.year, parsed.month
 
+def _month_starts(start: date, end: date):
+    current = start
+    while current <= end:
+        yield current
+        current = date(current.year + current.month // 12, current.month % 12 + 1, 1)
 
-def get_overall_savings():
+@timed()
+def get_range_summary(start: str, end: str, granularity: str = "month"):
     """
-    Calculate total overall savings across all time.
-    Subtracts expenses made from savings categories (e.g. spending from Investment Fund).
+    Summaries with the calculate_monthly_summary fields for every month, ISO week or day
+    between two months (inclusive). Months are index lookups; weeks and days come from a
+    single pass over the snapshot.
     """
-    transactions = get_all_transactions()
-    from services.categories import DEFAULT_SAVINGS_CATEGORIES
-    
-    savings_map = {}
-    total_savings = 0
-    
-    for t in transactions:
-        amount = 0
+    if granularity not in RANGE_GRANULARITIES:
+        raise ValueError(f"granularity must be one of {', '.join(RANGE_GRANULARITIES)}")
+    start_year, start_month = parse_year_month(start)
+    end_year, end_month = parse_year_month(end)
+    first_day = date(start_year, start_month, 1)
+    last_day = date(end_year, end_month, calendar.monthrange(end_year, end_month)[1])
+    if last_day < first_day:
+        raise ValueError("'from' must not be after 'to'")
+
+    # Count the periods arithmetically first, so an oversized range is rejected without
+    # building its list
+    first_monday = first_day + timedelta(days=(7 - first_day.weekday()) % 7 or 7)
+    if granularity == "month":
+        count = (end_year - start_year) * 12 + end_month - start_month + 1
+    elif granularity == "week":
+        count = 1 + ((last_day - first_monday).days // 7 + 1 if first_monday <= last_day else 0)
+    else:
+        count = (last_day - first_day).days + 1
+    if count > MAX_RANGE_PERIODS:
+        raise ValueError(f"Range covers {count} periods; the limit is {MAX_RANGE_PERIODS}")
+
+    # Period keys are the first day of each period, clipped to the range
+    if granularity == "month":
+        period_starts = list(_month_starts(first_day, last_day))
+    elif granularity == "week":
+        period_starts = [first_day] + [first_monday + timedelta(weeks=i) for i in range(count - 1)]
+    else:
+        period_starts = [first_day + timedelta(days=offset) for offset in range(count)]
+
+    periods = []
+    if granularity == "month":
+        index = get_aggregate_index()
+        for period_start in period_starts:
+            summary = index.monthly_summary(period_start.month, period_start.year)
+            periods.append((period_start, summary))
+    else:
+        periods = _scan_periods(period_starts, first_day, last_day, granularity)
+
+    result = []
+    for i, (period_start, summary) in enumerate(periods):
+        period_end = period_starts[i + 1] - timedelta(days=1) if i + 1 < len(period_starts) else last_day
+        if granularity == "month":
+            label = period_start.strftime("%Y-%m")
+        elif granularity == "week":
+            iso_year, iso_week, _ = period_start.isocalendar()
+            label = f"{iso_year}-W{iso_week:02d}"
+        else:
+            label = period_start.isoformat()
+        result.append({"period": label, "start": period_start.isoformat(), "end": period_end.isoformat(), **summary})
+
+    return {"from": start, "to": end, "granularity": granularity, "periods": result}
+
+def _scan_periods(period_starts, first_day: date, last_day: date, granularity: str):
+    """One pass over the snapshot, bucketing rows by the day or week of their Date."""
+    savings_categories = get_categories().savings_set
+
+    # Rows are selected by their Year/Month columns and placed on the Date's day of month,
+    # the same way the dashboard charts bucket them
+    months_in_range = {
+        (month_start.year, month_start.strftime("%B")): month_start
+        for month_start in _month_starts(first_day, last_day)
+    }
+    buckets = {period_start: new_bucket() for period_start in period_starts}
+
+    for t in get_all_transactions():
+        t_year = t.get('Year', '')
         try:
-            # Clean amount string
-            amount_str = str(t.get('Amount', 0)).lstrip("'")
-            amount = float(amount_str)
+            key = (int(t_year) if t_year else 0, t.get('Month', ''))
         except (ValueError, TypeError):
             continue
-            
-        category = t.get('Category', '').strip()
-        t_type = t.get('Type', '').strip().lower() # Normalize to lowercase
-        
-        # Check against savings categories
-        is_savings_cat = category in DEFAULT_SAVINGS_CATEGORIES
-        
-        if t_type == 'savings':
-            total_savings += amount
-            savings_map[category] = savings_map.get(category, 0) + amount
-        elif t_type == 'expense' and is_savings_cat:
-            total_savings -= amount
-            savings_map[category] = savings_map.get(category, 0) - amount
-        elif t_type == 'income' and is_savings_cat:
-            # Theoretical case: Income directly into a savings fund
-            total_savings += amount
-            savings_map[category] = savings_map.get(category, 0) + amount
-            
-    # Filter out zero balances for the chart
-    breakdown = {k: v for k, v in savings_map.items() if v != 0}
-    
-    return {
-        "total_overall_savings": total_savings,
-        "savings_breakdown": breakdown
-    }
+        month_start = months_in_range.get(key)
+        if month_start is None:
+            continue
+
+        t_date = parse_date(t['Date'])
+        if not t_date:
+            continue
+        days_in_month = calendar.monthrange(month_start.year, month_start.month)[1]
+        day = month_start.replace(day=min(t_date.day, days_in_month))
+        if granularity == "week":
+            day = max(first_day, day - timedelta(days=day.weekday()))
+
+        try:
+            amount = parse_amount(t['Amount'])
+        except (ValueError, TypeError):
+            continue
+        accumulate(buckets[day], t['Type'].strip().lower(), t['Category'], amount, savings_categories)
+
+    return [
+        (period_start, summarize_bucket(buckets[period_start], period_start.month, period_start.year))
+        for period_start in period_starts
+    ]
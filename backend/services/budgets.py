@@ -1,10 +1,18 @@
+import contextlib
 import json
 import os
+import tempfile
+import threading
 import uuid
 from pydantic import BaseModel, Field
-from services.analytics import calculate_monthly_summary
 from typing import Optional, List
-from services.categories import EXPENSE_CATEGORIES, DEFAULT_SAVINGS_CATEGORIES
+from services.categories import get_categories
+from services.metrics import timed
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread lock only
+    fcntl = None
 
 BUDGET_FILE = os.path.join(os.path.dirname(__file__), "..", "budgets.json")
 
@@ -16,105 +24,242 @@ class Budget(BaseModel):
     year: Optional[int] = None
     threshold: float = 0.8 # 80%
 
+class BudgetRepository:
+    """
+    budgets.json, loaded once and indexed by id and by (category, month, year).
+
+    Reads come from memory; the file is re-read only when its mtime/size shows another
+    worker changed it. Writes happen under a lock (plus an flock across workers, where
+    available) and are atomic: the new contents are written to a temp file, fsynced and
+    renamed over the old one, so a crash never leaves a half-written file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._by_id = {}
+        self._by_key = {}
+        self._file_state = None
+        self._loaded = False
+        self.version = 0
+
+    @staticmethod
+    def _key(budget):
+        return (budget['category'], budget.get('month'), budget.get('year'))
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _index(self, data):
+        self._by_id = {}
+        self._by_key = {}
+        for b in data:
+            self._by_id[b['id']] = b
+            self._by_key[self._key(b)] = b['id']
+        self.version += 1
+
+    def _refresh(self):
+        """Load the file on first use, or again when another process has replaced it."""
+        state = self._stat()
+        if self._loaded and state == self._file_state:
+            return
+        data = []
+        if state is not None:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+
+        # Migration: Ensure all budgets have IDs
+        migrated = False
+        for b in data:
+            if 'id' not in b:
+                b['id'] = str(uuid.uuid4())
+                migrated = True
+
+        self._index(data)
+        self._file_state = state
+        self._loaded = True
+        if migrated:
+            self._write()
+
+    def _write(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".budgets-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(list(self._by_id.values()), f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        try:
+            # Persist the rename itself
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+        self._file_state = self._stat()
+        self.version += 1
+
+    @contextlib.contextmanager
+    def _writing(self):
+        """Exclusive access for a read-modify-write, across threads and (with fcntl) workers."""
+        with self._lock:
+            lock_file = None
+            if fcntl is not None:
+                lock_file = open(self.path + ".lock", "a")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def current_version(self):
+        """Version of the budgets, after picking up changes made by another worker."""
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def all(self):
+        with self._lock:
+            self._refresh()
+            return [dict(b) for b in self._by_id.values()]
+
+    def for_period(self, month, year):
+        with self._lock:
+            self._refresh()
+            return [dict(b) for b in self._by_id.values() if b.get('month') == month and b.get('year') == year]
+
+    def get(self, budget_id):
+        with self._lock:
+            self._refresh()
+            b = self._by_id.get(budget_id)
+            return dict(b) if b is not None else None
+
+    def find(self, category, month, year):
+        with self._lock:
+            self._refresh()
+            budget_id = self._by_key.get((category, month, year))
+            return dict(self._by_id[budget_id]) if budget_id is not None else None
+
+    def upsert(self, budget: dict):
+        """Add a budget, or update amount/threshold of the one with the same category, month and year."""
+        with self._writing():
+            existing_id = self._by_key.get(self._key(budget))
+            if existing_id is not None:
+                existing = self._by_id[existing_id]
+                existing['amount'] = budget['amount']
+                existing['threshold'] = budget['threshold']
+                self._write()
+                return dict(existing)
+
+            new_budget = dict(budget)
+            if not new_budget.get('id'):
+                new_budget['id'] = str(uuid.uuid4())
+            self._by_id[new_budget['id']] = new_budget
+            self._by_key[self._key(new_budget)] = new_budget['id']
+            self._write()
+            return dict(new_budget)
+
+    def delete(self, budget_id):
+        with self._writing():
+            budget = self._by_id.pop(budget_id, None)
+            if budget is None:
+                return False
+            if self._by_key.get(self._key(budget)) == budget_id:
+                del self._by_key[self._key(budget)]
+            self._write()
+            return True
+
+    def replace_all(self, budgets):
+        with self._writing():
+            self._index([dict(b) for b in budgets])
+            self._write()
+
+_repository = BudgetRepository(BUDGET_FILE)
+
+def get_repository():
+    return _repository
+
 def load_budgets():
-    if not os.path.exists(BUDGET_FILE):
-        return []
-    with open(BUDGET_FILE, "r") as f:
-        data = json.load(f)
-        
-    # Migration: Ensure all budgets have IDs
-    migrated = False
-    for b in data:
-        if 'id' not in b:
-            b['id'] = str(uuid.uuid4())
-            migrated = True
-            
-    if migrated:
-        save_budgets(data)
-        
-    return data
+    return _repository.all()
 
 def save_budgets(budgets):
-    with open(BUDGET_FILE, "w") as f:
-        json.dump(budgets, f, indent=4)
+    _repository.replace_all(budgets)
 
 def get_budgets(month: Optional[int] = None, year: Optional[int] = None):
-    budgets = load_budgets()
     if month is not None and year is not None:
-        return [b for b in budgets if b.get('month') == month and b.get('year') == year]
-    return budgets
+        return _repository.for_period(month, year)
+    return _repository.all()
 
 def add_budget(budget: Budget):
-    budgets = load_budgets()
-    
-    # Check for duplicate (same category, month, year) - Update if exists
-    for b in budgets:
-        if (b['category'] == budget.category and 
-            b.get('month') == budget.month and 
-            b.get('year') == budget.year):
-            
-            # Update existing
-            b['amount'] = budget.amount
-            b['threshold'] = budget.threshold
-            save_budgets(budgets)
-            return b
-            
-    # Add new
-    new_budget = budget.dict()
-    if not new_budget.get('id'):
-        new_budget['id'] = str(uuid.uuid4())
-        
-    budgets.append(new_budget)
-    save_budgets(budgets)
-    return new_budget
+    # Same category, month and year updates the existing budget
+    return _repository.upsert(budget.dict())
 
 def delete_budget(budget_id: str):
-    budgets = load_budgets()
-    initial_len = len(budgets)
-    new_budgets = [b for b in budgets if b.get('id') != budget_id]
+    return _repository.delete(budget_id)
+
+def budget_alert(b, spending, savings_categories):
+    """Alert entry for one budget given what was spent (or saved) in its category."""
+    category_type = "savings" if b['category'] in savings_categories else "expense"
     
-    if len(new_budgets) < initial_len:
-        save_budgets(new_budgets)
-        return True
-    return False
-
-def check_alerts(month: int, year: int):
-    summary = calculate_monthly_summary(month, year)
-    budgets = get_budgets(month, year)
-    alerts = []
+    # Determine status and color
+    status = "normal"
+    msg = ""
     
+    if category_type == "expense":
+        if spending >= b['amount']:
+            status = "critical" # Red
+            msg = "Goal Reached!!"
+        elif spending >= b['amount'] * b['threshold']:
+            status = "warning" # Yellow
+    else: # Savings
+        if spending >= b['amount']:
+            status = "success" # Blue
+            msg = "Goal Reached!!"
+            
+    return {
+        "category": b['category'],
+        "limit": b['amount'],
+        "spent": spending,
+        "percentage": (spending / b['amount']) * 100 if b['amount'] > 0 else 0,
+        "status": status,
+        "msg": msg,
+        "type": category_type
+    }
+
+def combined_spending(summary):
     # Combine expense and savings breakdowns
-    combined_spending = {
+    return {
         **summary.get('expense_breakdown', {}),
         **summary.get('savings_breakdown', {})
     }
-    
-    for b in budgets:
-        spending = combined_spending.get(b['category'], 0)
-        category_type = "savings" if b['category'] in DEFAULT_SAVINGS_CATEGORIES else "expense"
-        
-        # Determine status and color
-        status = "normal"
-        msg = ""
-        
-        if category_type == "expense":
-            if spending >= b['amount']:
-                status = "critical" # Red
-                msg = "Goal Reached!!"
-            elif spending >= b['amount'] * b['threshold']:
-                status = "warning" # Yellow
-        else: # Savings
-            if spending >= b['amount']:
-                status = "success" # Blue
-                msg = "Goal Reached!!"
-                
-        alerts.append({
-            "category": b['category'],
-            "limit": b['amount'],
-            "spent": spending,
-            "percentage": (spending / b['amount']) * 100 if b['amount'] > 0 else 0,
-            "status": status,
-            "msg": msg,
-            "type": category_type
-        })
-    return alerts
+
+@timed()
+def check_alerts(month: int, year: int, summary: Optional[dict] = None):
+    if summary is None:
+        # Served from the alert engine's running counters
+        from services.alerts import get_alerts
+        return get_alerts(month, year)
+
+    # Callers that already hold the month's summary (e.g. the dashboard) pass it in
+    spending = combined_spending(summary)
+    savings_categories = get_categories().savings_set
+    return [
+        budget_alert(b, spending.get(b['category'], 0), savings_categories)
+        for b in get_budgets(month, year)
+    ]
@@ -1,30 +1,159 @@
 import os
 import json
+import tempfile
+import threading
+import time
+from collections import namedtuple
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 CATEGORIES_FILE = os.path.join(DATA_DIR, "categories.json")
 
+# How often (seconds) the file's mtime is checked for saves made by another worker
+CATEGORIES_CHECK_INTERVAL = float(os.getenv("CATEGORIES_CHECK_INTERVAL", "1.0"))
+
+DEFAULT_VAULTS = ["Bkash", "Bank", "Other"]
+TRANSACTION_TYPES = ["expense", "income", "savings"]
+
+# Immutable view of categories.json: tuples keep file order, frozensets give O(1) membership
+Categories = namedtuple("Categories", [
+    "version", "expense", "income", "savings", "vaults",
+    "expense_set", "income_set", "savings_set"
+])
+
+class CategoryRegistry:
+    """
+    Parsed categories.json, shared by the API, analytics, budgets and the prompt builder.
+
+    The file is read once and re-read only when save() replaces it or its mtime changes
+    (checked at most every CATEGORIES_CHECK_INTERVAL seconds). Every reload bumps
+    `version` and calls the subscribed callbacks with the new Categories.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._categories = None
+        self._file_state = None
+        self._checked_at = 0.0
+        self._version = 0
+        self._subscribers = []
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def _read(self, state):
+        data = {}
+        if state is not None:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        self._version += 1
+        expense = tuple(data.get("expense", []))
+        income = tuple(data.get("income", []))
+        savings = tuple(data.get("savings", []))
+        # A missing file means no categories at all; a file without vaults gets the defaults
+        vaults = tuple(data.get("vaults", DEFAULT_VAULTS if state is not None else []))
+        self._categories = Categories(
+            self._version, expense, income, savings, vaults,
+            frozenset(expense), frozenset(income), frozenset(savings)
+        )
+        self._file_state = state
+
+    def get(self):
+        """Current Categories, reloading first if the file changed."""
+        changed = None
+        with self._lock:
+            now = time.monotonic()
+            if self._categories is None or now - self._checked_at >= CATEGORIES_CHECK_INTERVAL:
+                self._checked_at = now
+                state = self._stat()
+                if self._categories is None or state != self._file_state:
+                    self._read(state)
+                    changed = self._categories
+            categories = self._categories
+        if changed is not None:
+            self._notify(changed)
+        return categories
+
+    def save(self, categories: dict):
+        """Atomically replace categories.json and reload."""
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".categories-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(categories, f, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+            self._read(self._stat())
+            self._checked_at = time.monotonic()
+            changed = self._categories
+        self._notify(changed)
+
+    def subscribe(self, callback):
+        """Call `callback(categories)` after every reload (outside the registry lock)."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def _notify(self, categories):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(categories)
+            except Exception as e:
+                print(f"Category subscriber error: {e}")
+
+    @property
+    def version(self):
+        return self.get().version
+
+_registry = CategoryRegistry(CATEGORIES_FILE)
+
+def get_registry():
+    return _registry
+
+def get_categories():
+    """Current categories as an immutable Categories tuple."""
+    return _registry.get()
+
 def load_categories():
-    if not os.path.exists(CATEGORIES_FILE):
-        return {
-            "expense": [],
-            "income": [],
-            "savings": [],
-            "vaults": []
-        }
-    with open(CATEGORIES_FILE, "r") as f:
-        return json.load(f)
+    cats = _registry.get()
+    return {
+        "expense": list(cats.expense),
+        "income": list(cats.income),
+        "savings": list(cats.savings),
+        "vaults": list(cats.vaults)
+    }
 
 def save_categories(categories):
-    os.makedirs(DATA_DIR, exist_ok=True)
-    with open(CATEGORIES_FILE, "w") as f:
-        json.dump(categories, f, indent=4)
+    _registry.save(categories)
 
-# Load initial values
-_cats = load_categories()
+def get_categories_version():
+    """Changes whenever the categories change, in this process or another worker."""
+    return _registry.version
 
-EXPENSE_CATEGORIES = _cats.get("expense", [])
-INCOME_CATEGORIES = _cats.get("income", [])
-DEFAULT_SAVINGS_CATEGORIES = _cats.get("savings", [])
-VAULT_LOCATIONS = _cats.get("vaults", ["Bkash", "Bank", "Other"])
-TRANSACTION_TYPES = ["expense", "income", "savings"]
+# Legacy module constants, kept for scripts that import them; the app reads
+# get_categories(). Resolved on first access so importing this module reads no file.
+_LEGACY_CONSTANTS = {
+    "EXPENSE_CATEGORIES": "expense",
+    "INCOME_CATEGORIES": "income",
+    "DEFAULT_SAVINGS_CATEGORIES": "savings",
+    "VAULT_LOCATIONS": "vaults",
+}
+
+def __getattr__(name):
+    if name in _LEGACY_CONSTANTS:
+        return load_categories()[_LEGACY_CONSTANTS[name]]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
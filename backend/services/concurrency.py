@@ -0,0 +1,40 @@
+# backend/services/concurrency.py
+"""
+Keeps blocking I/O off the event loop.
+
+gspread is synchronous, so Sheets work runs on a bounded thread pool; LLM calls use the
+async OpenAI client and are capped by a per-loop semaphore. Image preprocessing is
+CPU-bound and gets its own small pool, so a batch of receipts can't hold every Sheets
+thread while dashboard requests wait behind it.
+"""
+import asyncio
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+SHEETS_MAX_WORKERS = int(os.getenv("SHEETS_MAX_WORKERS", "8"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+IMAGE_MAX_WORKERS = int(os.getenv("IMAGE_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_io_executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets-io")
+_image_executor = ThreadPoolExecutor(max_workers=IMAGE_MAX_WORKERS, thread_name_prefix="image-cpu")
+_llm_semaphores = weakref.WeakKeyDictionary()
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call (Sheets, file I/O) on the I/O pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor, functools.partial(func, *args, **kwargs))
+
+async def run_image_work(func, *args, **kwargs):
+    """Run CPU-heavy image work (decoding, resizing, encoding) on the image pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_image_executor, functools.partial(func, *args, **kwargs))
+
+def llm_slot():
+    """Semaphore limiting concurrent LLM requests on the running event loop."""
+    loop = asyncio.get_running_loop()
+    semaphore = _llm_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _llm_semaphores[loop] = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return semaphore
@@ -0,0 +1,112 @@
+# backend/services/images.py
+"""
+Shrinks uploaded receipt photos before they are sent to the LLM.
+
+Phone photos are typically 3-12 MB; the model reads a receipt just as well at ~1600px,
+so images are rotated upright from their EXIF orientation, downscaled to
+IMAGE_MAX_DIMENSION and re-encoded as IMAGE_FORMAT at IMAGE_QUALITY. Pillow is optional:
+without it (or for an image it can't decode) the original bytes are sent, labelled with
+their sniffed MIME type.
+"""
+import io
+import logging
+import os
+
+from services.uploads import content_size
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1600"))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+
+OUTPUT_MIME_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp"}
+
+_stats = {"processed": 0, "passthrough": 0, "bytes_in": 0, "bytes_out": 0}
+
+def sniff_mime_type(content: bytes):
+    """MIME type from the file's magic bytes (falls back to image/jpeg)."""
+    if content.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if content.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if content[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if content[:4] == b"RIFF" and content[8:12] == b"WEBP":
+        return "image/webp"
+    if content[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftypmsf1"):
+        return "image/heic"
+    return "image/jpeg"
+
+def _head(source, n=16):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:n])
+    source.seek(0)
+    head = source.read(n)
+    source.seek(0)
+    return head
+
+def prepare_image(source):
+    """
+    `source` is the upload as bytes or a seekable file. Returns (bytes or the original
+    source, mime_type), ready for encode_data_url. CPU-bound, so callers on the event
+    loop should run it with run_image_work.
+    """
+    size = content_size(source)
+    _stats["bytes_in"] += size
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return _passthrough(source, size)
+
+    output_format = IMAGE_FORMAT if IMAGE_FORMAT in OUTPUT_MIME_TYPES else "jpeg"
+    try:
+        if not isinstance(source, (bytes, bytearray)):
+            source.seek(0)
+        with Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source) as image:
+            rotated = image.getexif().get(0x0112, 1) != 1
+            oversized = max(image.size) > IMAGE_MAX_DIMENSION
+            # Let the JPEG decoder scale down by a power of two while decoding, so a
+            # 12-megapixel photo is never fully decompressed
+            image.draft("RGB", (IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+            if image.mode not in ("RGB", "L"):
+                # JPEG has no alpha channel; flatten transparent PNGs onto white
+                background = Image.new("RGB", image.size, "white")
+                rgba = image.convert("RGBA")
+                background.paste(rgba, mask=rgba.getchannel("A"))
+                image = background
+
+            buffer = io.BytesIO()
+            image.save(buffer, format=output_format.upper(), quality=IMAGE_QUALITY, optimize=True)
+    except Exception as e:
+        logger.warning(f"Could not preprocess image ({e}); sending it unchanged.")
+        return _passthrough(source, size)
+
+    encoded = buffer.getvalue()
+    unchanged = not rotated and not oversized
+    if unchanged and len(encoded) >= size and sniff_mime_type(_head(source)) in ("image/jpeg", "image/png", "image/webp"):
+        # Already small and upright; re-encoding would only cost quality
+        return _passthrough(source, size)
+
+    _stats["processed"] += 1
+    _stats["bytes_out"] += len(encoded)
+    return encoded, OUTPUT_MIME_TYPES[output_format]
+
+def _passthrough(source, size):
+    _stats["passthrough"] += 1
+    _stats["bytes_out"] += size
+    return source, sniff_mime_type(_head(source))
+
+def settings_tag():
+    """Identifies the preprocessing settings, so cached extractions follow changes to them."""
+    return f"{IMAGE_MAX_DIMENSION}:{IMAGE_FORMAT}:{IMAGE_QUALITY}"
+
+def get_image_stats():
+    return {
+        **_stats,
+        "max_dimension": IMAGE_MAX_DIMENSION,
+        "format": IMAGE_FORMAT,
+        "quality": IMAGE_QUALITY
+    }
@@ -0,0 +1,106 @@
+# backend/services/llm_cache.py
+"""
+Content-addressed cache of LLM extraction results.
+
+Keys combine a hash of the normalized input (text or image bytes), the model and a hash
+of the rendered system prompt, so a category change or a new day never reuses an old
+answer. Results live in a bounded in-memory LRU, with an optional on-disk tier
+(LLM_CACHE_DIR) that survives restarts and is shared between workers.
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+from services.uploads import hash_content
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "256"))
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "")
+
+_lock = threading.Lock()
+_entries = OrderedDict()
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so re-submitted text with stray spaces/newlines hits the cache."""
+    return re.sub(r"\s+", " ", text).strip()
+
+def make_key(kind: str, content, model: str, system_prompt: str) -> str:
+    """`content` is bytes or a seekable file (hashed in chunks)."""
+    prompt_hash = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+    digest = hashlib.sha256()
+    for part in (kind.encode("utf-8"), model.encode("utf-8"), prompt_hash.encode("utf-8")):
+        digest.update(hashlib.sha256(part).digest())
+    digest.update(hash_content(content))
+    return digest.hexdigest()
+
+def _disk_path(key: str):
+    return os.path.join(LLM_CACHE_DIR, f"{key}.json")
+
+def _remember(key, value):
+    _entries[key] = value
+    _entries.move_to_end(key)
+    while len(_entries) > LLM_CACHE_SIZE:
+        _entries.popitem(last=False)
+
+def get(key: str):
+    """Cached extraction for `key`, or None."""
+    with _lock:
+        if key in _entries:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return copy.deepcopy(_entries[key])
+
+    if LLM_CACHE_DIR:
+        try:
+            with open(_disk_path(key), "r") as f:
+                value = json.load(f)
+            with _lock:
+                _remember(key, value)
+                _stats["disk_hits"] += 1
+            return copy.deepcopy(value)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable LLM cache entry {key}: {e}")
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+def put(key: str, value):
+    with _lock:
+        _remember(key, copy.deepcopy(value))
+        _stats["stores"] += 1
+
+    if LLM_CACHE_DIR:
+        try:
+            os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=LLM_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, _disk_path(key))
+        except OSError as e:
+            logger.warning(f"Could not write LLM cache entry {key}: {e}")
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+def get_cache_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["disk_hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_ratio": (_stats["hits"] + _stats["disk_hits"]) / lookups if lookups else 0.0,
+            "entries": len(_entries),
+            "max_entries": LLM_CACHE_SIZE,
+            "disk_dir": LLM_CACHE_DIR or None
+        }
@@ -0,0 +1,197 @@
+# backend/services/metrics.py
+"""
+In-process request and span metrics, exposed in the Prometheus text format at /metrics.
+
+MetricsMiddleware times every HTTP request by route template and status, and logs the
+ones slower than SLOW_REQUEST_MS. `timed` / `span` record how long the hot paths take
+(Sheets auth and reads, analytics, LLM calls, sheet writes) as histograms labelled by
+span name. Counters and hit ratios the services already keep are added at scrape time
+as gauges, so nothing is counted twice.
+"""
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+
+PREFIX = "expense_tracker"
+# Seconds; wide enough for both in-memory aggregation and full sheet downloads / LLM calls
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by route template and status."),
+    "http_requests_in_progress": ("gauge", "HTTP requests currently being served."),
+    "http_slow_requests_total": ("counter", "HTTP requests slower than SLOW_REQUEST_MS."),
+    "span_duration_seconds": ("histogram", "Latency of instrumented functions (Sheets, analytics, LLM)."),
+    "span_errors_total": ("counter", "Instrumented calls that raised."),
+    "sheet_rows_read_total": ("counter", "Rows downloaded from the sheet."),
+    "sheet_rows_written_total": ("counter", "Rows appended to the sheet."),
+}
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+def observe(name: str, seconds: float, **labels):
+    """Add one observation to histogram `name`."""
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry["buckets"][i] += 1
+                break
+        entry["sum"] += seconds
+        entry["count"] += 1
+
+def increment(name: str, value: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def _add_gauge(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+@contextmanager
+def span(name: str):
+    """Time the enclosed block as span `name`; exceptions are counted and re-raised."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        increment("span_errors_total", span=name)
+        raise
+    finally:
+        observe("span_duration_seconds", time.perf_counter() - started, span=name)
+
+def timed(name: str = None):
+    """Decorator recording each call of a sync or async function as a span."""
+    def decorator(func):
+        span_name = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class MetricsMiddleware:
+    """Times HTTP requests (until the last body chunk is sent) and logs slow ones."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _add_gauge("http_requests_in_progress", 1)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _add_gauge("http_requests_in_progress", -1)
+            elapsed = time.perf_counter() - started
+            # The router stores the matched route in the scope; label by its template so
+            # /api/budgets/{budget_id} is one series, and unknown paths share one
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            observe("http_request_duration_seconds", elapsed, method=scope["method"], route=route, status=str(status))
+            if elapsed * 1000 >= SLOW_REQUEST_MS:
+                increment("http_slow_requests_total", method=scope["method"], route=route)
+                logger.warning(f"Slow request: {scope['method']} {scope['path']} took {elapsed * 1000:.0f} ms (status {status})")
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _stat_gauges(stats):
+    """{section: {key: number}} from the services' stats dicts (bools as 0/1, others skipped)."""
+    gauges = {}
+    for section, values in (stats or {}).items():
+        for key, value in values.items():
+            if isinstance(value, bool):
+                value = int(value)
+            if isinstance(value, (int, float)):
+                gauges[f"{section}_{key}"] = value
+    return gauges
+
+def render(stats=None):
+    """Everything recorded so far, plus `stats` as gauges, in Prometheus text format."""
+    with _lock:
+        histograms = {k: {**v, "buckets": list(v["buckets"])} for k, v in _histograms.items()}
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        full_name = f"{PREFIX}_{name}"
+        lines.append(f"# HELP {full_name} {help_text}")
+        lines.append(f"# TYPE {full_name} {kind}")
+        if kind == "histogram":
+            for (metric, labels), entry in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, entry["buckets"]):
+                    cumulative += count
+                    lines.append(f"{full_name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{full_name}_bucket{_labels(labels + (('le', '+Inf'),))} {entry['count']}")
+                lines.append(f"{full_name}_sum{_labels(labels)} {_number(entry['sum'])}")
+                lines.append(f"{full_name}_count{_labels(labels)} {entry['count']}")
+        else:
+            source = counters if kind == "counter" else gauges
+            for (metric, labels), value in sorted(source.items()):
+                if metric == name:
+                    lines.append(f"{full_name}{_labels(labels)} {_number(value)}")
+
+    for name, value in sorted(_stat_gauges(stats).items()):
+        full_name = f"{PREFIX}_{name}"
+        lines.append(f"# TYPE {full_name} gauge")
+        lines.append(f"{full_name} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    """Drop everything recorded (used by benchmarks between runs)."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
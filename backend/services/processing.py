@@ -1,50 +1,78 @@
 import os
 import json
-import base64
-from openai import OpenAI
-from datetime import datetime
+import asyncio
+import contextlib
+import copy
+import random
+import re
+import threading
+from datetime import datetime, timedelta
 
 # OpenRouter Configuration
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY", "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")
 SITE_URL = os.getenv("SITE_URL", "http://localhost:5173")
 APP_NAME = "Antigravity Budget"
 
-client = OpenAI(
-  base_url="https://openrouter.ai/api/v1",
-  api_key=OPENROUTER_API_KEY,
-)
+# Async client so extraction requests don't block the event loop. Built on first use:
+# importing openai is the largest part of a cold start.
+# Retries are handled by _create_completion, so the SDK's own are turned off.
+client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global client
+    with _client_lock:
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(
+              base_url="https://openrouter.ai/api/v1",
+              api_key=OPENROUTER_API_KEY,
+              max_retries=0,
+            )
+        return client
+
+# Rate-limit (429) and server (5xx) errors are retried with exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "30"))
 
 MODEL = "google/gemini-2.5-flash-lite"
 
-from services.categories import EXPENSE_CATEGORIES, INCOME_CATEGORIES, DEFAULT_SAVINGS_CATEGORIES, VAULT_LOCATIONS
+from services.concurrency import llm_slot, run_image_work
+from services.images import prepare_image, settings_tag
+from services.uploads import encode_data_url
+from services import llm_cache
+from services.metrics import span, timed
+from services.streaming import JsonArrayStreamParser
+from services.categories import get_categories
+from services.aggregates import parse_date
 
-SYSTEM_PROMPT_TEMPLATE = """
+# The prompt is ordered for provider-side prompt caching: the static instructions and
+# examples come first, then the category lists (which change rarely), and the date,
+# which changes daily, comes last.
+SYSTEM_PROMPT_PREFIX = """
 You are an advanced financial assistant. Your task is to extract structured transaction data from user input (text or image description).
-The current date is: {current_date}.
 
 Output must be a valid JSON array of objects. Each object represents one transaction with these fields:
 - transaction_type: 'income', 'expense', or 'savings'
-- date: YYYY-MM-DD
+- date: YYYY-MM-DD (use the current date given at the end unless the input says otherwise)
 - time: HH:MM (extract if mentioned, else empty string)
-- category: Pick the MOST relevant category from the lists below:
-  - For expense: {expense_cats}
-  - For income: {income_cats}
-  - For savings: {savings_cats}
+- category: Pick the MOST relevant category from the category lists below
 - amount: number (float)
-- vault_location: Pick from: {vaults} (default to 'Other' if unknown or not mentioned)
+- vault_location: Pick from the vault list below (default to 'Other' if unknown or not mentioned)
 - description: string (original text or concise summary)
 - detail_source_item: string (Source for Savings/Income like 'income' or 'outside', Item-Service for Expense like 'Taxi' or 'Lent to John')
 - attachments: empty string (handled by UI)
 - secondary_date: YYYY-MM-DD (Spent Date for Savings ONLY, else empty string)
 - secondary_time: HH:MM (Spent Time for Savings ONLY, else empty string)
 
-Examples:
+Examples (<current date> stands for the current date given at the end; always write a real YYYY-MM-DD date, never the placeholder):
 Input: "Lunch 500 BDT from Bkash. Saved 2000 in emergency fund from income."
 Output: 
 [
-  {{
+  {
     "transaction_type": "expense", 
-    "date": "{current_date}", 
+    "date": "<current date>", 
     "time": "", 
     "category": "food", 
     "amount": 500.0, 
@@ -54,10 +82,10 @@ Output:
     "attachments": "",
     "secondary_date": "",
     "secondary_time": ""
-  }},
-  {{
+  },
+  {
     "transaction_type": "savings", 
-    "date": "{current_date}", 
+    "date": "<current date>", 
     "time": "", 
     "category": "emergency fund", 
     "amount": 2000.0, 
@@ -67,56 +95,444 @@ Output:
     "attachments": "",
     "secondary_date": "",
     "secondary_time": ""
-  }}
+  }
 ]
 
 If input is irrelevant or empty, return empty array [].
 Do not include markdown code blocks (```json). Just return the raw JSON string.
 """
 
-def get_system_prompt(current_date):
-    return SYSTEM_PROMPT_TEMPLATE.format(
-        current_date=current_date,
-        expense_cats=", ".join(EXPENSE_CATEGORIES),
-        income_cats=", ".join(INCOME_CATEGORIES),
-        savings_cats=", ".join(DEFAULT_SAVINGS_CATEGORIES),
-        vaults=", ".join(VAULT_LOCATIONS)
+CATEGORIES_TEMPLATE = """
+Categories:
+- For expense: {expense_cats}
+- For income: {income_cats}
+- For savings: {savings_cats}
+Vaults: {vaults}
+"""
+
+DATE_TEMPLATE = """
+The current date is: {current_date}.
+"""
+
+_prompt_lock = threading.Lock()
+_categories_block = (None, "")
+_prompt = (None, "")
+
+def _render_categories_block(cats):
+    return CATEGORIES_TEMPLATE.format(
+        expense_cats=", ".join(cats.expense),
+        income_cats=", ".join(cats.income),
+        savings_cats=", ".join(cats.savings),
+        vaults=", ".join(cats.vaults)
     )
 
-async def get_llm_response(messages):
+def get_system_prompt(current_date):
+    """
+    Rendered system prompt, memoized per (date, categories version).
+    Saving categories bumps the version, so edits reach the prompt without a restart.
+    """
+    global _categories_block, _prompt
+    cats = get_categories()
+    with _prompt_lock:
+        key = (current_date, cats.version)
+        if _prompt[0] == key:
+            return _prompt[1]
+        if _categories_block[0] != cats.version:
+            _categories_block = (cats.version, _render_categories_block(cats))
+        prompt = SYSTEM_PROMPT_PREFIX + _categories_block[1] + DATE_TEMPLATE.format(current_date=current_date)
+        _prompt = (key, prompt)
+        return prompt
+
+# Simple one-line entries ("lunch 250 bkash", "salary 50000") are parsed by rules instead of
+# the LLM. Anything the rules can't read confidently (several amounts, no category, lots of
+# unrecognised words) still goes to the model.
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() not in ("0", "false", "no")
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
+# Everyday words for the default categories; entries whose category isn't configured are ignored
+CATEGORY_KEYWORDS = {
+    "food": ["lunch", "dinner", "breakfast", "snack", "snacks", "coffee", "tea", "restaurant", "pizza", "burger", "meal"],
+    "groceries": ["grocery", "bazar", "bazaar", "vegetables", "fish", "rice"],
+    "utilities": ["electricity", "internet", "wifi", "gas bill", "water bill", "phone bill", "mobile recharge", "recharge"],
+    "rent": ["house rent"],
+    "travel": ["uber", "taxi", "bus", "rickshaw", "cng", "pathao", "train", "fare", "fuel"],
+    "medical": ["medicine", "doctor", "pharmacy", "hospital"],
+    "fitness": ["gym"],
+    "entertainment": ["movie", "cinema", "netflix", "spotify", "game"],
+    "clothing": ["shirt", "shoes", "clothes", "dress"],
+    "self-care": ["haircut", "salon", "skincare"],
+    "maid service": ["maid"],
+    "job": ["salary", "paycheck", "bonus"],
+    "gifts": ["gift"],
+}
+TYPE_KEYWORDS = {
+    "expense": ["spent", "paid", "bought", "cost", "bill"],
+    "income": ["received", "earned", "got paid", "income"],
+    "savings": ["saved", "save", "deposited", "put aside"],
+}
+FILLER_WORDS = {
+    "for", "on", "from", "via", "in", "into", "to", "at", "with", "the", "a", "an", "my", "of", "by",
+    "using", "tk", "taka", "bdt", "usd", "rs", "today", "tonight", "yesterday", "ago", "days", "day", "before", "last",
+}
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+# Left-over words that mean the rules would misread the entry: dates they don't parse, and
+# money moving the other way (refunds, sales, repayments, withdrawals from a savings
+# fund). Any of them sends it to the LLM.
+UNSUPPORTED_WORDS = {
+    "january", "february", "march", "april", "may", "june", "july", "august", "september",
+    "october", "november", "december", "tomorrow", "week", "month", "year",
+    "refund", "refunded", "sold", "sell", "selling", "returned", "return", "back", "cashback",
+    "credited", "lent", "owe", "owes", "repaid", "split",
+    "withdrew", "withdraw", "withdrawn", "withdrawal", "took", "take", "used", "use",
+    "transferred", "transfer", "moved", "move", "out",
+}
+# Each unrecognised word left over costs this much confidence: with the default threshold
+# of 0.8 one stray word ("lunch 250 at cafe") is accepted, two are not
+LEFTOVER_PENALTY = 0.15
+
+AMOUNT_RE = re.compile(r"(?<![\w.])(?:৳|\$|tk\.?\s*)?(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?\s*(k\b)?", re.IGNORECASE)
+ISO_DATE_RE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+CLOCK_RE = re.compile(r"\b(?:at\s+)?(\d{1,2}):(\d{2})\s*(am|pm)?\b", re.IGNORECASE)
+MERIDIEM_RE = re.compile(r"\b(?:at\s+)?(\d{1,2})\s*(am|pm)\b", re.IGNORECASE)
+DAYS_AGO_RE = re.compile(r"\b(\d{1,2})\s+days?\s+ago\b", re.IGNORECASE)
+WEEKDAY_RE = re.compile(r"\b(last\s+)?(" + "|".join(WEEKDAYS) + r")\b", re.IGNORECASE)
+
+_fast_path_matcher = (None, None)
+_fast_path_stats = {"hits": 0, "fallbacks": 0}
+
+def _phrase_pattern(phrases):
+    # Longest first, so "emergency fund" wins over "fund"
+    ordered = sorted(set(phrases), key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(re.escape(p) for p in ordered) + r")\b", re.IGNORECASE) if ordered else None
+
+def _build_fast_path_matcher(cats):
+    categories = {}
+    for t_type in ("expense", "income", "savings"):
+        for name in getattr(cats, t_type):
+            # "Other" is a catch-all (and a vault name), not something to match on
+            if name.strip().lower() != "other":
+                categories.setdefault(name.lower(), (name, set()))[1].add(t_type)
+    phrases = {name: name for name in categories}
+    for category, words in CATEGORY_KEYWORDS.items():
+        if category in categories:
+            for word in words:
+                phrases.setdefault(word, category)
+    vaults = {v.lower(): v for v in cats.vaults if v.strip().lower() != "other"}
+    type_words = {w: t_type for t_type, words in TYPE_KEYWORDS.items() for w in words}
+    return {
+        "categories": categories,
+        "phrases": phrases,
+        "phrase_re": _phrase_pattern(phrases),
+        "vaults": vaults,
+        "vault_re": _phrase_pattern(vaults),
+        "type_words": type_words,
+        "type_re": _phrase_pattern(type_words),
+    }
+
+def _get_fast_path_matcher():
+    global _fast_path_matcher
+    cats = get_categories()
+    with _prompt_lock:
+        if _fast_path_matcher[0] != cats.version:
+            _fast_path_matcher = (cats.version, _build_fast_path_matcher(cats))
+        return _fast_path_matcher[1]
+
+def _consume(pattern, text):
+    """Matches of `pattern`, plus `text` with them blanked out."""
+    matches = list(pattern.finditer(text))
+    for m in matches:
+        text = text[:m.start()] + " " * (m.end() - m.start()) + text[m.end():]
+    return matches, text
+
+def _parse_relative_date(text, today):
+    """(date, remaining text) for today/yesterday/N days ago/[last] weekday/YYYY-MM-DD."""
+    matches, text = _consume(ISO_DATE_RE, text)
+    if matches:
+        y, m, d = (int(g) for g in matches[-1].groups())
+        try:
+            return datetime(y, m, d).date(), text
+        except ValueError:
+            return None, text
+    matches, text = _consume(DAYS_AGO_RE, text)
+    if matches:
+        return today - timedelta(days=int(matches[-1].group(1))), text
+    lowered = text.lower()
+    if "day before yesterday" in lowered:
+        return today - timedelta(days=2), text
+    if "yesterday" in lowered:
+        return today - timedelta(days=1), text
+    matches, text = _consume(WEEKDAY_RE, text)
+    if matches:
+        target = WEEKDAYS.index(matches[-1].group(2).lower())
+        back = (today.weekday() - target) % 7
+        if back == 0 and matches[-1].group(1):
+            back = 7
+        return today - timedelta(days=back), text
+    return today, text
+
+def _parse_time(text):
+    """("HH:MM" or "", remaining text)."""
+    for pattern in (CLOCK_RE, MERIDIEM_RE):
+        matches, remaining = _consume(pattern, text)
+        if matches:
+            groups = matches[-1].groups()
+            hour = int(groups[0])
+            minute = int(groups[1]) if pattern is CLOCK_RE else 0
+            meridiem = (groups[-1] or "").lower()
+            if meridiem == "pm" and hour < 12:
+                hour += 12
+            elif meridiem == "am" and hour == 12:
+                hour = 0
+            if hour < 24 and minute < 60:
+                return f"{hour:02d}:{minute:02d}", remaining
+    return "", text
+
+def _is_filler(word, matcher):
+    word = word.strip(".,;:!?").lower()
+    return not word or word in FILLER_WORDS or word in matcher["type_words"]
+
+def fast_path_extract(text: str, current_date: str):
+    """
+    Rule-based extraction of a single simple transaction, in the LLM's output schema.
+    Returns (transactions, confidence); transactions is None when the rules can't parse it.
+    """
+    if len(text) > 200 or "\n" in text.strip():
+        return None, 0.0
+    matcher = _get_fast_path_matcher()
+    today = datetime.strptime(current_date, "%Y-%m-%d").date()
+
+    date, remaining = _parse_relative_date(text, today)
+    if date is None:
+        return None, 0.0
+    time_of_day, remaining = _parse_time(remaining)
+
+    amounts, remaining = _consume(AMOUNT_RE, remaining)
+    if len(amounts) != 1:
+        # None, or several transactions in one line
+        return None, 0.0
+    whole, fraction, thousands = amounts[0].groups()
+    amount = float(whole.replace(",", "") + (fraction or ""))
+    if thousands:
+        amount *= 1000
+    if amount <= 0:
+        return None, 0.0
+
+    vault = "Other"
+    if matcher["vault_re"]:
+        vault_matches, remaining = _consume(matcher["vault_re"], remaining)
+        if len({m.group(1).lower() for m in vault_matches}) > 1:
+            return None, 0.0
+        if vault_matches:
+            vault = matcher["vaults"][vault_matches[0].group(1).lower()]
+
+    type_hints = set()
+    if matcher["type_re"]:
+        type_matches, _ = _consume(matcher["type_re"], remaining)
+        type_hints = {matcher["type_words"][m.group(1).lower()] for m in type_matches}
+
+    # What's left once amount, vault, date and time are removed reads as the description
+    description_words = remaining.split()
+    while description_words and _is_filler(description_words[0], matcher):
+        description_words.pop(0)
+    while description_words and _is_filler(description_words[-1], matcher):
+        description_words.pop()
+
+    category_matches = []
+    if matcher["phrase_re"]:
+        category_matches, remaining = _consume(matcher["phrase_re"], remaining)
+    matched = {matcher["phrases"][m.group(1).lower()] for m in category_matches}
+    if len(matched) != 1:
+        return None, 0.0
+    category_key = next(iter(matched))
+    category, category_types = matcher["categories"][category_key]
+
+    candidate_types = category_types & type_hints if type_hints else category_types
+    if len(candidate_types) != 1:
+        # A verb that contradicts the category, or a category shared between types
+        return None, 0.0
+    t_type = next(iter(candidate_types))
+    if t_type == "savings" and "savings" not in type_hints:
+        # The rules only produce deposits; without "saved"/"deposited" the entry may
+        # just as well be spending out of the fund
+        return None, 0.0
+
+    leftovers = [
+        w for w in re.findall(r"[a-z][a-z'-]*", remaining.lower())
+        if w not in FILLER_WORDS and w not in matcher["type_words"]
+    ]
+    if any(w in UNSUPPORTED_WORDS for w in leftovers):
+        return None, 0.0
+    confidence = max(0.0, 1.0 - LEFTOVER_PENALTY * len(leftovers))
+
+    description = " ".join(description_words) or category
+    description = description[:1].upper() + description[1:]
+    transaction = {
+        "transaction_type": t_type,
+        "date": date.strftime("%Y-%m-%d"),
+        "time": time_of_day,
+        "category": category,
+        "amount": amount,
+        "vault_location": vault,
+        "description": description,
+        "detail_source_item": description if t_type == "expense" else "",
+        "attachments": "",
+        "secondary_date": "",
+        "secondary_time": ""
+    }
+    return [transaction], confidence
+
+def try_fast_path(text: str):
+    """Rule-based extraction when it's confident enough, else None (use the LLM)."""
+    if not FAST_PATH_ENABLED:
+        return None
+    try:
+        extracted, confidence = fast_path_extract(text, datetime.now().strftime("%Y-%m-%d"))
+    except Exception as e:
+        print(f"Fast path error: {e}")
+        extracted, confidence = None, 0.0
+    if extracted is not None and confidence >= FAST_PATH_MIN_CONFIDENCE:
+        _fast_path_stats["hits"] += 1
+        return extracted
+    _fast_path_stats["fallbacks"] += 1
+    return None
+
+def get_fast_path_stats():
+    return {**_fast_path_stats, "enabled": FAST_PATH_ENABLED, "min_confidence": FAST_PATH_MIN_CONFIDENCE}
+
+# Extractions in flight, so a double-click waits for the first request instead of paying twice
+_inflight = {}
+
+def _is_retryable(e):
+    from openai import APIConnectionError, APIStatusError
+    if isinstance(e, APIStatusError):
+        return e.status_code == 429 or e.status_code >= 500
+    # Timeouts and dropped connections
+    return isinstance(e, APIConnectionError)
+
+def _retry_delay(e, attempt):
+    """Seconds to wait before retry `attempt` (1-based): Retry-After when given, else jittered backoff."""
+    response = getattr(e, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), LLM_RETRY_MAX_DELAY)
+    except ValueError:
+        pass
+    delay = min(LLM_RETRY_BASE_DELAY * 2 ** (attempt - 1), LLM_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+async def _create_completion(messages, stream=False, use_slot=True):
+    """
+    chat.completions.create, retried on 429/5xx/connection errors. With `use_slot` each
+    attempt takes an LLM slot, released while backing off so other requests can use it.
+    """
+    attempt = 0
+    while True:
+        try:
+            async with llm_slot() if use_slot else contextlib.nullcontext():
+                return await get_client().chat.completions.create(
+                    extra_headers={
+                        "HTTP-Referer": SITE_URL,
+                        "X-Title": APP_NAME,
+                    },
+                    model=MODEL,
+                    messages=messages,
+                    stream=stream,
+                )
+        except Exception as e:
+            attempt += 1
+            if attempt > LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"LLM request failed ({e}); retry {attempt}/{LLM_MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+def _normalize_date(item):
+    """
+    Rewrite `date` as YYYY-MM-DD when it is in another format the sheet accepts
+    (e.g. a receipt's 15/03/2025); a missing or unparseable date, such as the prompt's
+    copied placeholder, becomes today's date.
+    """
+    if not isinstance(item, dict):
+        return item
+    parsed = parse_date(str(item.get("date", "")).strip())
+    item["date"] = (parsed or datetime.now()).strftime("%Y-%m-%d")
+    return item
+
+async def _request_extraction(messages):
+    # Upstream time only: cache hits and deduplicated waits never get here
+    with span("llm_request"):
+        completion = await _create_completion(messages)
+    content = completion.choices[0].message.content
+    # Clean potential markdown
+    content = content.replace("```json", "").replace("```", "").strip()
+    extracted = json.loads(content)
+    if isinstance(extracted, list):
+        for item in extracted:
+            _normalize_date(item)
+    return extracted
+
+async def extract(messages, cache_key=None):
+    """Extracted transactions for `messages` (cached, deduplicated); raises on failure."""
+    if cache_key:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        if cache_key in _inflight:
+            return copy.deepcopy(await asyncio.shield(_inflight[cache_key]))
+
+    task = asyncio.ensure_future(_request_extraction(messages))
+    if cache_key:
+        _inflight[cache_key] = task
     try:
-        completion = client.chat.completions.create(
-            extra_headers={
-                "HTTP-Referer": SITE_URL,
-                "X-Title": APP_NAME,
-            },
-            model=MODEL,
-            messages=messages,
-        )
-        content = completion.choices[0].message.content
-        # Clean potential markdown
-        content = content.replace("```json", "").replace("```", "").strip()
-        return json.loads(content)
+        # Shielded so a disconnecting client doesn't cancel a result others are waiting on
+        extracted = await asyncio.shield(task)
+    finally:
+        if cache_key:
+            _inflight.pop(cache_key, None)
+    # Only successful responses are cached; failures fall through to the next attempt
+    if cache_key:
+        llm_cache.put(cache_key, extracted)
+    return extracted
+
+@timed()
+async def get_llm_response(messages, cache_key=None):
+    try:
+        return await extract(messages, cache_key)
     except Exception as e:
         print(f"LLM Error: {e}")
         # Return empty list on failure
         return []
 
-async def process_text_content(text: str):
+def build_text_request(text: str):
+    """Messages and cache key for a text extraction."""
     current_date = datetime.now().strftime("%Y-%m-%d")
+    system_prompt = get_system_prompt(current_date)
     messages = [
-        {"role": "system", "content": get_system_prompt(current_date)},
+        {"role": "system", "content": system_prompt},
         {"role": "user", "content": text}
     ]
-    extracted = await get_llm_response(messages)
-    return {"text": text, "extracted": extracted}
+    cache_key = llm_cache.make_key("text", llm_cache.normalize_text(text).encode("utf-8"), MODEL, system_prompt)
+    return messages, cache_key
+
+def _image_payload(image, system_prompt):
+    """Cache key and data URL for an uploaded image (blocking: hashes and re-encodes it)."""
+    # Keyed on the uploaded bytes plus the preprocessing settings that shaped the request
+    cache_key = llm_cache.make_key(f"image:{settings_tag()}", image, MODEL, system_prompt)
+    prepared, mime_type = prepare_image(image)
+    return cache_key, encode_data_url(prepared, mime_type)
 
-async def process_image_content(image_content: bytes):
+async def build_image_request(image):
+    """
+    Messages and cache key for an image extraction. `image` is bytes or the upload's
+    spooled file; it is downscaled first and never copied into memory whole.
+    """
     current_date = datetime.now().strftime("%Y-%m-%d")
-    base64_image = base64.b64encode(image_content).decode('utf-8')
+    system_prompt = get_system_prompt(current_date)
+    cache_key, data_url = await run_image_work(_image_payload, image, system_prompt)
     
     messages = [
-        {"role": "system", "content": get_system_prompt(current_date)},
+        {"role": "system", "content": system_prompt},
         {
             "role": "user",
             "content": [
@@ -124,15 +540,123 @@ async def process_image_content(image_content: bytes):
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{base64_image}"
+                        "url": data_url
                     }
                 }
             ]
         }
     ]
-    extracted = await get_llm_response(messages)
+    return messages, cache_key
+
+async def process_text_content(text: str):
+    extracted = try_fast_path(text)
+    if extracted is not None:
+        return {"text": text, "extracted": extracted}
+    messages, cache_key = build_text_request(text)
+    extracted = await get_llm_response(messages, cache_key)
+    return {"text": text, "extracted": extracted}
+
+async def process_image_content(image):
+    messages, cache_key = await build_image_request(image)
+    extracted = await get_llm_response(messages, cache_key)
     return {"text": "[Image Processed]", "extracted": extracted}
 
-async def process_audio_content(content: bytes):
+async def stream_llm_response(messages, cache_key=None):
+    """
+    Stream an extraction, yielding {"type": "transaction", "data": {...}} events as each
+    object of the model's JSON array completes, then {"type": "done", "count": n}
+    (or {"type": "error", "message": ...}).
+    """
+    if cache_key:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            for item in cached:
+                yield {"type": "transaction", "data": item}
+            yield {"type": "done", "count": len(cached), "cached": True}
+            return
+
+    extracted = []
+    try:
+        parser = JsonArrayStreamParser()
+        # The slot covers reading the whole stream, not just opening it
+        async with llm_slot():
+            with span("llm_stream"):
+                stream = await _create_completion(messages, stream=True, use_slot=False)
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    for item in parser.feed(delta):
+                        _normalize_date(item)
+                        extracted.append(item)
+                        yield {"type": "transaction", "data": item}
+    except Exception as e:
+        print(f"LLM Error: {e}")
+        yield {"type": "error", "message": str(e)}
+        return
+
+    if cache_key:
+        llm_cache.put(cache_key, extracted)
+    yield {"type": "done", "count": len(extracted), "cached": False}
+
+async def stream_text_content(text: str):
+    extracted = try_fast_path(text)
+    if extracted is not None:
+        for item in extracted:
+            yield {"type": "transaction", "data": item}
+        yield {"type": "done", "count": len(extracted), "cached": False}
+        return
+    messages, cache_key = build_text_request(text)
+    async for event in stream_llm_response(messages, cache_key):
+        yield event
+
+async def _process_batch_item(index, kind, payload, name=None):
+    """One batch entry's result; failures are reported per item instead of failing the batch."""
+    result = {"index": index, "kind": kind}
+    if name:
+        result["name"] = name
+    try:
+        extracted = try_fast_path(payload) if kind == "text" else None
+        if extracted is None:
+            if kind == "text":
+                messages, cache_key = build_text_request(payload)
+            else:
+                messages, cache_key = await build_image_request(payload)
+            extracted = await extract(messages, cache_key)
+        result["extracted"] = extracted
+        result["status"] = "success"
+    except Exception as e:
+        print(f"LLM Error (batch item {index}): {e}")
+        result["status"] = "error"
+        result["error"] = str(e)
+    return result
+
+def _start_batch(items):
+    # Every item starts at once; llm_slot() caps how many reach the provider concurrently
+    return [
+        asyncio.ensure_future(_process_batch_item(index, kind, payload, name))
+        for index, (kind, payload, name) in enumerate(items)
+    ]
+
+async def process_batch(items):
+    """
+    Extract from many (kind, payload, name) items, kind being "text" (payload a string)
+    or "image" (bytes or a file). Returns per-item results in input order.
+    """
+    return await asyncio.gather(*_start_batch(items))
+
+async def iter_batch(items):
+    """Like process_batch, but yields each item's result as soon as it finishes."""
+    tasks = _start_batch(items)
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def process_audio_content(content):
     # Deprecated/Removed feature
     return {"text": "Audio not supported", "extracted": []}
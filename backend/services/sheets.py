@@ -1,10 +1,12 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 import os
 import json
 import logging
+import math
+import threading
+import time
 from pydantic import BaseModel
 from datetime import datetime
+from services.metrics import increment, span, timed
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -32,85 +34,402 @@ class Transaction(BaseModel):
     secondary_date: str = ""
     secondary_time: str = ""
 
-def get_sheet_client():
-    """Initialize and return the Google Sheets client."""
-    try:
-        creds = None
-        # Try to load credentials from environment variable first (for Vercel)
-        creds_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
-        if creds_json:
+# Long-lived client/worksheet handles shared by the API and the migration scripts.
+# Service-account tokens live for an hour, so the client is rebuilt a little before that
+# (or immediately when Sheets answers with an auth error).
+CLIENT_MAX_AGE = int(os.getenv("SHEETS_CLIENT_MAX_AGE", "3000"))
+
+# Incremental refreshes read columns A:H only. Edits in the middle of the sheet are
+# caught by the spreadsheet's Drive modifiedTime (see fetch_changes); a full reload
+# still runs this often for the edits that signal can't tell apart from appends.
+INCREMENTAL_WIDTH = 8
+FULL_RELOAD_INTERVAL = float(os.getenv("SHEETS_FULL_RELOAD_INTERVAL", "3600"))
+
+# The cached first worksheet is re-resolved this often (and before every write), so a
+# migration that swaps a new sheet into first place is picked up without a restart.
+WORKSHEET_CHECK_INTERVAL = float(os.getenv("SHEETS_WORKSHEET_CHECK_INTERVAL", "60"))
+
+_client_lock = threading.RLock()
+_client = None
+_creds = None
+_client_created_at = 0.0
+_spreadsheet = None
+_worksheet = None
+_worksheet_checked_at = 0.0
+# Set once the Drive API refuses modifiedTime reads (e.g. not enabled for the project)
+_modified_time_unavailable = False
+
+def _load_credentials():
+    """Load service-account credentials from the environment or credentials.json."""
+    # Imported here so a cold start only pays for oauth2client when Sheets is first used
+    from oauth2client.service_account import ServiceAccountCredentials
+    creds = None
+    # Try to load credentials from environment variable first (for Vercel)
+    creds_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
+    if creds_json:
+        try:
+            creds_data = json.loads(creds_json)
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_data, SCOPE)
+            logger.info("Loaded Google credentials from environment variable.")
+        except Exception as e:
+            logger.error(f"Error loading credentials from environment: {e}")
+            # Continue to try file-based credentials if env var fails
+
+    if not creds: # If credentials not loaded from env var or failed
+        # Fall back to file-based credentials (for local development)
+        if not os.path.exists(CREDS_FILE):
+            logger.warning(f"{CREDS_FILE} not found. Sheets integration disabled.")
+            return None
+        creds = ServiceAccountCredentials.from_json_keyfile_name(CREDS_FILE, SCOPE)
+        logger.info(f"Loaded Google credentials from file: {CREDS_FILE}")
+
+    return creds
+
+def _client_is_stale():
+    if _client is None:
+        return True
+    if time.monotonic() - _client_created_at > CLIENT_MAX_AGE:
+        return True
+    return bool(getattr(_creds, "access_token_expired", False))
+
+@timed()
+def get_sheet_client(force_refresh: bool = False):
+    """Return the shared Google Sheets client, authorizing only when needed."""
+    global _client, _creds, _client_created_at, _spreadsheet, _worksheet
+    with _client_lock:
+        if not force_refresh and not _client_is_stale():
+            return _client
+        try:
+            with span("sheets_auth"):
+                creds = _load_credentials()
+                if not creds:
+                    logger.error("No valid Google credentials found.")
+                    return None
+
+                import gspread
+                _client = gspread.authorize(creds)
+            _creds = creds
+            _client_created_at = time.monotonic()
+            # Handles opened with the previous client must not outlive it
+            _spreadsheet = None
+            _worksheet = None
+            return _client
+        except Exception as e:
+            logger.error(f"Error authenticating with Google Sheets: {e}")
+            return None
+
+def get_spreadsheet():
+    """Return the cached spreadsheet handle for SHEET_ID (None without credentials)."""
+    global _spreadsheet
+    with _client_lock:
+        client = get_sheet_client()
+        if not client:
+            return None
+        if _spreadsheet is None:
+            # Open sheet by ID strictly (requires only Sheets API, not Drive API)
+            _spreadsheet = client.open_by_key(SHEET_ID)
+        return _spreadsheet
+
+def get_worksheet(verify: bool = False):
+    """
+    Return the cached first worksheet, the one transactions are written to. It is checked
+    against the spreadsheet (a metadata fetch) every WORKSHEET_CHECK_INTERVAL seconds, or
+    now with `verify`.
+    """
+    global _worksheet, _worksheet_checked_at
+    replaced = None
+    with _client_lock:
+        spreadsheet = get_spreadsheet()
+        if spreadsheet is None:
+            return None
+        now = time.monotonic()
+        if _worksheet is None:
+            _worksheet = spreadsheet.sheet1
+            _worksheet_checked_at = now
+        elif verify or now - _worksheet_checked_at >= WORKSHEET_CHECK_INTERVAL:
             try:
-                creds_data = json.loads(creds_json)
-                creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_data, SCOPE)
-                logger.info("Loaded Google credentials from environment variable.")
+                first = spreadsheet.sheet1
+                _worksheet_checked_at = now
+                if first.id != _worksheet.id:
+                    replaced = _worksheet
+                    _worksheet = first
             except Exception as e:
-                logger.error(f"Error loading credentials from environment: {e}")
-                # Continue to try file-based credentials if env var fails
-        
-        if not creds: # If credentials not loaded from env var or failed
-            # Fall back to file-based credentials (for local development)
-            if not os.path.exists(CREDS_FILE):
-                logger.warning(f"{CREDS_FILE} not found. Sheets integration disabled.")
-                return None
-            creds = ServiceAccountCredentials.from_json_keyfile_name(CREDS_FILE, SCOPE)
-            logger.info(f"Loaded Google credentials from file: {CREDS_FILE}")
-        
-        if not creds:
-            logger.error("No valid Google credentials found.")
-            return None
+                # Keep the cached handle; the next call checks again
+                logger.warning(f"Could not check the first worksheet: {e}")
+        worksheet = _worksheet
+
+    if replaced is not None:
+        logger.warning(f"First worksheet changed from '{replaced.title}' to '{worksheet.title}'; reloading from it")
+        # Outside _client_lock: the snapshot lock is taken before it elsewhere
+        from services.snapshot import invalidate
+        invalidate()
+    return worksheet
+
+def reset_sheet_client():
+    """Drop the cached client and handles so the next call re-authorizes."""
+    global _client, _creds, _client_created_at, _spreadsheet, _worksheet
+    with _client_lock:
+        _client = None
+        _creds = None
+        _client_created_at = 0.0
+        _spreadsheet = None
+        _worksheet = None
+
+def is_auth_error(error: Exception) -> bool:
+    from gspread.exceptions import APIError
+    if isinstance(error, APIError):
+        return error.code == 401
+    message = str(error).lower()
+    return "invalid_grant" in message or "unauthenticated" in message or "token expired" in message
+
+def with_worksheet(func):
+    """
+    Run `func(worksheet)` against the shared worksheet.
+    On an auth error the client is rebuilt once and the call retried.
+    """
+    for attempt in range(2):
+        worksheet = get_worksheet()
+        if worksheet is None:
+            raise RuntimeError("Google Sheets client is not available.")
+        try:
+            return func(worksheet)
+        except Exception as e:
+            if attempt == 0 and is_auth_error(e):
+                logger.warning(f"Sheets auth error, refreshing client: {e}")
+                reset_sheet_client()
+                continue
+            raise
+
+def _trim_row(row):
+    values = [str(v) for v in row[:INCREMENTAL_WIDTH]]
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+def _cell_value(value):
+    # Rows we appended hold 250.0 where Sheets renders "250", so compare numbers as numbers
+    try:
+        return float(str(value).lstrip("'").replace(",", ""))
+    except ValueError:
+        return str(value)
+
+def rows_match(a, b):
+    a, b = _trim_row(a), _trim_row(b)
+    return len(a) == len(b) and all(_cell_value(x) == _cell_value(y) for x, y in zip(a, b))
+
+def get_all_values():
+    """Download every row of the worksheet (the one full read of the sheet)."""
+    with span("sheet_get_all_values"):
+        data = with_worksheet(lambda sheet: sheet.get_all_values())
+    increment("sheet_rows_read_total", len(data))
+    return data
+
+@timed("sheet_fetch_rows_after")
+def fetch_rows_after(last_row: int, headers, tail_row):
+    """
+    Fetch only the rows appended after sheet row `last_row` (columns A:H).
 
-        client = gspread.authorize(creds)
-        return client
+    One batch_get re-reads the header row and row `last_row` alongside the new rows; if
+    either differs from what was ingested, rows were edited or deleted and None is
+    returned so the caller can fall back to a full reload.
+    """
+    header_values, tail_values = with_worksheet(
+        lambda sheet: sheet.batch_get(["A1:H1", f"A{last_row}:H"])
+    )
+    if not rows_match(header_values[0] if header_values else [], headers):
+        return None
+    if not tail_values or not rows_match(tail_values[0], tail_row):
+        return None
+    increment("sheet_rows_read_total", len(tail_values) - 1)
+    # The API leaves out trailing empty cells; pad to A:H like get_all_values() would
+    return [list(row) + [""] * (INCREMENTAL_WIDTH - len(row)) for row in tail_values[1:]]
+
+@timed("sheet_modified_time")
+def get_modified_time():
+    """
+    The spreadsheet's Drive modifiedTime: changes on any edit, append or formatting
+    change in any of its worksheets. None when it can't be read.
+    """
+    global _modified_time_unavailable
+    if _modified_time_unavailable:
+        return None
+    spreadsheet = get_spreadsheet()
+    if spreadsheet is None:
+        return None
+    try:
+        return spreadsheet.get_lastUpdateTime()
     except Exception as e:
-        logger.error(f"Error authenticating with Google Sheets: {e}")
+        from gspread.exceptions import APIError
+        if isinstance(e, APIError) and e.code in (403, 404):
+            _modified_time_unavailable = True
+            logger.warning(f"Drive modifiedTime unavailable ({e}); edits are picked up by the periodic full reload only")
+        else:
+            logger.warning(f"Could not read the spreadsheet's modifiedTime: {e}")
+        return None
+
+def fetch_changes(last_row: int, headers, tail_row, modified_time, appended_since: bool = False):
+    """
+    (rows appended after `last_row`, current modifiedTime) for a copy of the sheet taken
+    at `modified_time`; rows is None when a full reload is needed.
+
+    An unchanged modifiedTime means nothing was written, so the sheet isn't read at all.
+    A changed one with no new rows, and no appends of our own since (`appended_since`),
+    means rows were edited. Edits made alongside new rows still wait for the periodic
+    full reload.
+    """
+    current = get_modified_time()
+    if current is not None and current == modified_time:
+        return [], current
+    rows = fetch_rows_after(last_row, headers, tail_row)
+    if rows is None:
+        return None, current
+    if current is not None and modified_time is not None and not rows and not appended_since:
+        return None, current
+    return rows, current
+
+def build_transaction_row(transaction: Transaction):
+    """Build the 8-column sheet row for a transaction (raises ValueError if it can't be stored)."""
+    from services.categories import TRANSACTION_TYPES
+    if transaction.transaction_type.strip().lower() not in TRANSACTION_TYPES:
+        raise ValueError(f"Unknown transaction type: {transaction.transaction_type!r}")
+    amount = float(transaction.amount)
+    if not math.isfinite(amount):
+        raise ValueError(f"Invalid amount: {transaction.amount}")
+
+    # Prepare augmented description
+    # Include Vault and Details if they are not the same as description
+    desc_parts = [transaction.description]
+    if transaction.vault_location and transaction.vault_location != "Other":
+        desc_parts.append(f"[Vault: {transaction.vault_location}]")
+    if transaction.detail_source_item and transaction.detail_source_item != transaction.description:
+        desc_parts.append(f"[Detail: {transaction.detail_source_item}]")
+    
+    full_description = " ".join(desc_parts)
+    
+    # Parse date to extract Year and Month
+    try:
+        parsed_date = datetime.strptime(transaction.date, "%Y-%m-%d")
+        year = parsed_date.year
+        month = parsed_date.strftime("%B")  # Full month name
+    except ValueError:
+        # Fallback to current date if parsing fails
+        logger.warning(f"Could not parse transaction date '{transaction.date}', using current date")
+        parsed_date = datetime.now()
+        year = parsed_date.year
+        month = parsed_date.strftime("%B")
+
+    # Prepare row based on updated schema (8 columns):
+    # 1. Date, 2. Amount, 3. Category, 4. Type, 5. Description, 6. Timestamp, 7. Year, 8. Month
+    return [
+        transaction.date,
+        amount,  # Store as number, not string
+        transaction.category,
+        transaction.transaction_type,
+        full_description,
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        year,
+        month
+    ]
+
+def appended_start_row(response):
+    """First row number written by an append call, from its updatedRange (e.g. 'Sheet1!A12:H14')."""
+    try:
+        updated_range = response["updates"]["updatedRange"]
+        first_cell = updated_range.split("!")[-1].split(":")[0]
+        return int("".join(ch for ch in first_cell if ch.isdigit()))
+    except (KeyError, TypeError, ValueError):
         return None
 
+def appended_sheet_title(response):
+    """Title of the worksheet an append call wrote to, from its updatedRange."""
+    try:
+        title = response["updates"]["updatedRange"].rsplit("!", 1)[0]
+    except (KeyError, TypeError, AttributeError):
+        return None
+    if title.startswith("'") and title.endswith("'"):
+        title = title[1:-1].replace("''", "'")
+    return title
+
 def add_transaction_to_sheet(transaction: Transaction):
-    client = get_sheet_client() # Updated function call
-    if not client:
-        return {"status": "simulated", "message": "Credentials missing, transaction not saved to Sheets.", "data": transaction.dict()}
+    return add_transactions_to_sheet([transaction])[0]
 
+@timed()
+def add_transactions_to_sheet(transactions):
+    """
+    Save transactions with a single append_rows call.
+    Returns one status dict per transaction, in order; rows that fail validation get an
+    error status and are left out of the write.
+    """
+    results = [None] * len(transactions)
     try:
-        # Open sheet by ID strictly (requires only Sheets API, not Drive API)
-        sheet = client.open_by_key(SHEET_ID).sheet1
-        
-        # Prepare augmented description
-        # Include Vault and Details if they are not the same as description
-        desc_parts = [transaction.description]
-        if transaction.vault_location and transaction.vault_location != "Other":
-            desc_parts.append(f"[Vault: {transaction.vault_location}]")
-        if transaction.detail_source_item and transaction.detail_source_item != transaction.description:
-            desc_parts.append(f"[Detail: {transaction.detail_source_item}]")
-        
-        full_description = " ".join(desc_parts)
-        
-        # Parse date to extract Year and Month
-        try:
-            parsed_date = datetime.strptime(transaction.date, "%Y-%m-%d")
-            year = parsed_date.year
-            month = parsed_date.strftime("%B")  # Full month name
-        except ValueError:
-            # Fallback to current date if parsing fails
-            logger.warning(f"Could not parse transaction date '{transaction.date}', using current date")
-            parsed_date = datetime.now()
-            year = parsed_date.year
-            month = parsed_date.strftime("%B")
-
-        # Prepare row based on updated schema (8 columns):
-        # 1. Date, 2. Amount, 3. Category, 4. Type, 5. Description, 6. Timestamp, 7. Year, 8. Month
-        row = [
-            transaction.date,
-            float(transaction.amount),  # Store as number, not string
-            transaction.category,
-            transaction.transaction_type,
-            full_description,
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            year,
-            month
-        ]
-        
-        sheet.append_row(row)
-        return {"status": "success", "message": "Transaction saved to Sheets.", "data": transaction.dict()}
+        if get_worksheet() is None:
+            return [
+                {"status": "simulated", "message": "Credentials missing, transaction not saved to Sheets.", "data": t.dict()}
+                for t in transactions
+            ]
     except Exception as e:
         logger.error(f"Error saving to sheet: {e}")
-        return {"status": "error", "message": str(e), "data": transaction.dict()}
+        return [{"status": "error", "message": str(e), "data": t.dict()} for t in transactions]
+
+    rows = []
+    row_positions = []
+    for i, transaction in enumerate(transactions):
+        try:
+            rows.append(build_transaction_row(transaction))
+            row_positions.append(i)
+        except Exception as e:
+            logger.warning(f"Rejected transaction {i}: {e}")
+            results[i] = {"status": "error", "message": str(e), "data": transaction.dict()}
+
+    if rows:
+        from services import alerts
+        # Load the affected months' budget counters first, so crossings can be detected
+        alerts.prepare_rows(rows)
+        try:
+            with span("sheet_append_rows"):
+                title, response = with_worksheet(lambda sheet: (sheet.title, sheet.append_rows(rows)))
+            increment("sheet_rows_written_total", len(rows))
+        except Exception as e:
+            logger.error(f"Error saving to sheet: {e}")
+            # The worksheet may have been deleted or swapped out; re-check it for the next write
+            try:
+                get_worksheet(verify=True)
+            except Exception as check_error:
+                logger.warning(f"Could not re-check the worksheet: {check_error}")
+            for i in row_positions:
+                results[i] = {"status": "error", "message": str(e), "data": transactions[i].dict()}
+            return results
+
+        # The rows are in the sheet from here on, so bookkeeping failures must not turn
+        # the response into an error (a client retry would duplicate the transactions)
+        from services import snapshot
+        written_to = appended_sheet_title(response)
+        if written_to is not None and written_to != title:
+            # Renamed since the handle was fetched: a migration has swapped in a new first
+            # worksheet (it copies these rows over from the backup). Switch to it now; the
+            # switch reloads the snapshot, so the rows aren't recorded against the old one.
+            logger.warning(f"Rows were appended to '{written_to}', which was '{title}'; re-checking the first worksheet")
+            get_worksheet(verify=True)
+            snapshot.invalidate()
+        else:
+            try:
+                snapshot.record_appended_rows(rows, appended_start_row(response))
+            except Exception as e:
+                logger.error(f"Rows saved to Sheets but the local copies were not updated: {e}")
+                snapshot.invalidate()
+        crossings = [[] for _ in rows]
+        try:
+            crossings = alerts.apply_rows(rows)
+        except Exception as e:
+            logger.error(f"Rows saved to Sheets but budget alerts were not updated: {e}")
+
+        for i, row_alerts in zip(row_positions, crossings):
+            results[i] = {
+                "status": "success",
+                "message": "Transaction saved to Sheets.",
+                "data": transactions[i].dict(),
+                # Budgets this write pushed into warning/critical/success
+                "alerts": row_alerts
+            }
+
+    return results
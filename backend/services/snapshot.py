@@ -0,0 +1,225 @@
+# backend/services/snapshot.py
+"""
+Shared in-memory snapshot of the transactions sheet.
+
+When the local store is available the snapshot is loaded from it and reloaded only when
+the store changes; otherwise the sheet is refreshed at most once per SNAPSHOT_TTL_SECONDS,
+fetching only the rows appended since the last refresh when nothing else changed.
+Rows appended through add_transaction_to_sheet are written through to both, so reads stay
+consistent without another full download.
+"""
+from services.sheets import get_worksheet, get_all_values, get_modified_time, fetch_changes, FULL_RELOAD_INTERVAL, INCREMENTAL_WIDTH
+from services import store
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL_SECONDS", "60"))
+
+# Updated Schema (8 cols): Date, Amount, Category, Type, Description, Timestamp, Year, Month
+DEFAULT_HEADERS = ["Date", "Amount", "Category", "Type", "Description", "Timestamp", "Year", "Month"]
+
+_lock = threading.RLock()
+_transactions = None
+_header_map = None
+_loaded_at = 0.0
+_source_version = None
+_force_sync = False
+_version = 0
+# Watermark for incremental refreshes straight from Sheets (used when the store is off)
+_sheet_headers = None
+_sheet_row_count = 0
+_sheet_tail_row = None
+_sheet_modified_time = None
+# Rows we appended since the last check, which also change the modifiedTime
+_sheet_appended = False
+_full_loaded_at = 0.0
+_stats = {"hits": 0, "misses": 0, "refreshes": 0, "incremental_refreshes": 0, "appended_rows": 0, "errors": 0}
+
+def build_header_map(headers):
+    # Mapping index based on headers to be safe
+    return {h.strip(): i for i, h in enumerate(headers)}
+
+def row_to_transaction(row, header_map):
+    """Convert one raw sheet row into the dict shape used by analytics (None if too short)."""
+    if len(row) < 4:
+        return None
+    return {
+        "Date": row[header_map.get("Date", 0)],
+        "Amount": row[header_map.get("Amount", 1)],
+        "Category": row[header_map.get("Category", 2)],
+        "Type": row[header_map.get("Type", 3)],
+        "Description": row[header_map.get("Description", 4)] if "Description" in header_map else "",
+        "Year": row[header_map.get("Year", 6)] if "Year" in header_map and len(row) > 6 else "",
+        "Month": row[header_map.get("Month", 7)] if "Month" in header_map and len(row) > 7 else ""
+    }
+
+def parse_rows(data):
+    """Parse the output of get_all_values() into (header_map, transactions)."""
+    if not data:
+        return build_header_map(DEFAULT_HEADERS), []
+
+    header_map = build_header_map(data[0])
+    transactions = []
+    for row in data[1:]:
+        t = row_to_transaction(row, header_map)
+        if t is not None:
+            transactions.append(t)
+    return header_map, transactions
+
+def _store_is_stale():
+    # Without the background sync (scripts, tests) the store is refreshed on the read path
+    if store.is_sync_running():
+        return False
+    synced_at = store.last_synced_at()
+    return synced_at is None or time.time() - synced_at > SNAPSHOT_TTL
+
+def _is_fresh():
+    # _force_sync is checked explicitly: a zeroed _loaded_at can still look recent while
+    # the monotonic clock is younger than the TTL
+    if _transactions is None or _force_sync:
+        return False
+    if _source_version is not None and store.is_ready() and not _store_is_stale():
+        return store.get_version() == _source_version
+    return time.monotonic() - _loaded_at < SNAPSHOT_TTL
+
+def _append_transactions(rows):
+    """Copy-on-write extend, so readers iterating the previous list are unaffected."""
+    global _transactions, _version
+    new_transactions = []
+    for row in rows:
+        t = row_to_transaction([str(v) for v in row], _header_map)
+        if t is not None:
+            new_transactions.append(t)
+    _transactions = _transactions + new_transactions
+    _version += 1
+    return len(new_transactions)
+
+def _refresh_from_sheet_incrementally():
+    """Fetch only rows past the watermark; False when a full download is required."""
+    global _sheet_row_count, _sheet_tail_row, _sheet_modified_time, _sheet_appended
+    if _transactions is None or _force_sync or _sheet_tail_row is None or _sheet_row_count < 1:
+        return False
+    if time.monotonic() - _full_loaded_at > FULL_RELOAD_INTERVAL:
+        return False
+    if any(i >= INCREMENTAL_WIDTH for i in _header_map.values()):
+        # Columns beyond H wouldn't be fetched by the A:H range
+        return False
+
+    new_rows, _sheet_modified_time = fetch_changes(
+        _sheet_row_count, _sheet_headers, _sheet_tail_row, _sheet_modified_time, _sheet_appended
+    )
+    _sheet_appended = False
+    if new_rows is None:
+        logger.info("Sheet rows were edited or deleted; reloading the full sheet.")
+        return False
+    if new_rows:
+        _append_transactions(new_rows)
+        _sheet_row_count += len(new_rows)
+        _sheet_tail_row = new_rows[-1]
+    _stats["incremental_refreshes"] += 1
+    return True
+
+def _load():
+    global _transactions, _header_map, _loaded_at, _source_version, _force_sync, _version
+    global _sheet_headers, _sheet_row_count, _sheet_tail_row, _sheet_modified_time, _full_loaded_at
+    if store.is_ready():
+        if _force_sync or _store_is_stale():
+            store.sync_from_sheet(full=_force_sync)
+        _source_version = store.get_version()
+        headers, rows = store.load_rows()
+        _header_map, _transactions = parse_rows([headers] + rows)
+        _version += 1
+    else:
+        if get_worksheet() is None:
+            return False
+        if not _refresh_from_sheet_incrementally():
+            # Read first, so a write during the download shows up as a change next time
+            modified_time = get_modified_time()
+            data = get_all_values()
+            _header_map, _transactions = parse_rows(data)
+            _sheet_headers = data[0] if data else []
+            _sheet_row_count = len(data)
+            _sheet_tail_row = data[-1] if data else None
+            _sheet_modified_time = modified_time
+            _full_loaded_at = time.monotonic()
+            _version += 1
+            # Seed the local store so the next process start reads from disk
+            store.replace_all(data, modified_time)
+            _source_version = store.get_version()
+    _loaded_at = time.monotonic()
+    _force_sync = False
+    _stats["refreshes"] += 1
+    return True
+
+def get_transactions():
+    """
+    Return the cached list of transactions, reloading it when older than the TTL.
+    The returned list is shared and must not be mutated by callers.
+    """
+    with _lock:
+        if _is_fresh():
+            _stats["hits"] += 1
+            return _transactions
+
+        _stats["misses"] += 1
+        try:
+            if not _load():
+                return []
+        except Exception as e:
+            _stats["errors"] += 1
+            logger.error(f"Error fetching transactions for analytics: {e}")
+            # Serve the last good snapshot rather than an empty dashboard
+            return _transactions if _transactions is not None else []
+        return _transactions
+
+def record_appended_rows(rows, start_row=None):
+    """
+    Write-through for rows just appended to the sheet (raw 8-column rows).
+    `start_row` is the sheet row number of the first one, when the API reported it.
+    """
+    global _source_version, _sheet_row_count, _sheet_tail_row, _sheet_appended
+    with _lock:
+        _sheet_appended = True
+        in_sync = _source_version is not None and _source_version == store.get_version()
+        store.append_rows(rows, start_row)
+        if in_sync:
+            # The store now holds exactly what we append below, so no reload is needed
+            _source_version = store.get_version()
+
+        if _transactions is None or not rows:
+            # Nothing cached yet; the next read downloads the sheet including these rows
+            return
+        _stats["appended_rows"] += _append_transactions(rows)
+        if start_row is None or start_row == _sheet_row_count + 1:
+            # Move the watermark past our own rows; a mismatch is caught by the tail check
+            _sheet_row_count += len(rows)
+            _sheet_tail_row = [str(v) for v in rows[-1]]
+
+def invalidate():
+    """Force the next read to download the sheet again."""
+    global _loaded_at, _source_version, _force_sync
+    with _lock:
+        _loaded_at = 0.0
+        _source_version = None
+        _force_sync = True
+
+def get_version():
+    """Monotonic counter bumped whenever the snapshot contents change."""
+    return _version
+
+def get_snapshot_stats():
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "hit_ratio": _stats["hits"] / lookups if lookups else 0.0,
+            "rows": len(_transactions) if _transactions is not None else 0,
+            "age_seconds": time.monotonic() - _loaded_at if _transactions is not None else None,
+            "ttl_seconds": SNAPSHOT_TTL,
+            "source": "local_store" if store.is_ready() else "sheets",
+            "version": _version
+        }
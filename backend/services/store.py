@@ -0,0 +1,319 @@
+# backend/services/store.py
+"""
+Local SQLite mirror of the transactions sheet.
+
+The sheet stays the system of record; this store is the read path. It keeps the same
+8 columns as add_transaction_to_sheet, keyed by sheet row number, and a background
+thread reconciles it with the sheet every STORE_SYNC_INTERVAL seconds. The sheet is
+append-only in normal use, so a sync fetches just the rows after the last one ingested
+(the watermark), skips the read entirely when the spreadsheet's modifiedTime hasn't
+moved, and falls back to a full download when the header or the watermark row has
+changed, when the sheet was modified without new rows (an edit), or every
+SHEETS_FULL_RELOAD_INTERVAL seconds. When the file
+can't be created (e.g. a read-only serverless filesystem) the store disables itself and
+reads fall back to Sheets.
+"""
+from services.sheets import get_worksheet, get_all_values, get_modified_time, fetch_changes, FULL_RELOAD_INTERVAL
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+STORE_PATH = os.getenv("LOCAL_STORE_PATH", os.path.join(os.path.dirname(__file__), "..", "data", "transactions.db"))
+STORE_ENABLED = os.getenv("LOCAL_STORE_ENABLED", "true").lower() not in ("0", "false", "no")
+SYNC_INTERVAL = float(os.getenv("STORE_SYNC_INTERVAL", "60"))
+
+# Date, Amount, Category, Type, Description, Timestamp, Year, Month
+ROW_WIDTH = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    row_num INTEGER PRIMARY KEY,
+    date TEXT NOT NULL DEFAULT '',
+    amount TEXT NOT NULL DEFAULT '',
+    category TEXT NOT NULL DEFAULT '',
+    type TEXT NOT NULL DEFAULT '',
+    description TEXT NOT NULL DEFAULT '',
+    timestamp TEXT NOT NULL DEFAULT '',
+    year TEXT NOT NULL DEFAULT '',
+    month TEXT NOT NULL DEFAULT ''
+);
+-- Reads load the whole table in row order, so secondary indexes only slow down syncs
+DROP INDEX IF EXISTS idx_transactions_year_month;
+DROP INDEX IF EXISTS idx_transactions_type;
+DROP INDEX IF EXISTS idx_transactions_category;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+_lock = threading.RLock()
+_conn = None
+_disabled = not STORE_ENABLED
+_ready = False
+_local_writes = 0
+_stats = {
+    "syncs": 0,
+    "full_syncs": 0,
+    "incremental_syncs": 0,
+    "sync_errors": 0,
+    "rows_upserted": 0,
+    "rows_deleted": 0,
+    "rows_appended": 0
+}
+
+_sync_thread = None
+_sync_stop = threading.Event()
+
+def _connect():
+    global _conn, _disabled
+    if _disabled:
+        return None
+    if _conn is None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(STORE_PATH)), exist_ok=True)
+            conn = sqlite3.connect(STORE_PATH, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            _conn = conn
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Local transaction store unavailable ({e}); reading from Sheets directly.")
+            _disabled = True
+            return None
+    return _conn
+
+def _normalize_row(row):
+    """Pad/trim a raw sheet row to the 8 stored columns (None for rows analytics skips)."""
+    if len(row) < 4:
+        return None
+    values = [str(v) for v in row[:ROW_WIDTH]]
+    return tuple(values + [""] * (ROW_WIDTH - len(values)))
+
+def _get_meta(conn, key):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+def is_enabled():
+    with _lock:
+        return _connect() is not None
+
+def is_ready():
+    """True once the store holds at least one full copy of the sheet."""
+    global _ready
+    with _lock:
+        if _ready:
+            return True
+        conn = _connect()
+        if conn is None:
+            return False
+        _ready = _get_meta(conn, "headers") is not None
+        return _ready
+
+def get_version():
+    """
+    Changes whenever the stored rows change, in this process (local write counter)
+    or in another worker sharing the file (SQLite's data_version).
+    """
+    with _lock:
+        conn = _connect()
+        if conn is None:
+            return None
+        return (_local_writes, conn.execute("PRAGMA data_version").fetchone()[0])
+
+def last_synced_at():
+    with _lock:
+        conn = _connect()
+        if conn is None:
+            return None
+        value = _get_meta(conn, "synced_at")
+        return float(value) if value else None
+
+def load_rows():
+    """Return (headers, rows) in sheet order, as lists of strings."""
+    with _lock:
+        conn = _connect()
+        headers = json.loads(_get_meta(conn, "headers") or "[]")
+        rows = [list(r) for r in conn.execute(
+            "SELECT date, amount, category, type, description, timestamp, year, month "
+            "FROM transactions ORDER BY row_num"
+        )]
+        return headers, rows
+
+def replace_all(data, modified_time=None):
+    """
+    Reconcile the store with a full sheet download (get_all_values() output), taken
+    when the spreadsheet's modifiedTime was `modified_time`.
+    Only rows that differ are written; rows no longer in the sheet are deleted.
+    Returns the number of changed rows, or None when the store is disabled.
+    """
+    global _local_writes, _ready
+    with _lock:
+        conn = _connect()
+        if conn is None:
+            return None
+
+        headers = data[0] if data else []
+        incoming = {}
+        for row_num, row in enumerate(data[1:], start=2):
+            values = _normalize_row(row)
+            if values is not None:
+                incoming[row_num] = values
+
+        existing = {
+            r[0]: tuple(r[1:]) for r in conn.execute(
+                "SELECT row_num, date, amount, category, type, description, timestamp, year, month FROM transactions"
+            )
+        }
+        upserts = [(n,) + v for n, v in incoming.items() if existing.get(n) != v]
+        deletes = [(n,) for n in existing if n not in incoming]
+
+        with conn:
+            if upserts:
+                conn.executemany("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", upserts)
+            if deletes:
+                conn.executemany("DELETE FROM transactions WHERE row_num = ?", deletes)
+            _set_meta(conn, "headers", json.dumps(headers))
+            # Watermark: last sheet row ingested and its values, checked by the next sync
+            _set_meta(conn, "row_count", str(len(data)))
+            _set_meta(conn, "tail_row", json.dumps([str(v) for v in data[-1]] if data else []))
+            now = str(time.time())
+            _set_meta(conn, "synced_at", now)
+            _set_meta(conn, "full_synced_at", now)
+            _set_meta(conn, "modified_time", modified_time or "")
+            _set_meta(conn, "appended_since_sync", "0")
+
+        if upserts or deletes:
+            _local_writes += 1
+        _ready = True
+        _stats["rows_upserted"] += len(upserts)
+        _stats["rows_deleted"] += len(deletes)
+        return len(upserts) + len(deletes)
+
+def append_rows(rows, start_row=None):
+    """Record rows just appended to the sheet. `start_row` is their first sheet row number."""
+    global _local_writes
+    with _lock:
+        conn = _connect()
+        if conn is None or not is_ready():
+            return
+        if not rows:
+            return
+        if start_row is None:
+            # Appends land after the last ingested row
+            start_row = int(_get_meta(conn, "row_count") or 1) + 1
+
+        values = []
+        for row_num, row in enumerate(rows, start=start_row):
+            normalized = _normalize_row(row)
+            if normalized is not None:
+                values.append((row_num,) + normalized)
+        last_row = start_row + len(rows) - 1
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values)
+            if rows and last_row >= int(_get_meta(conn, "row_count") or 0):
+                _set_meta(conn, "row_count", str(last_row))
+                _set_meta(conn, "tail_row", json.dumps([str(v) for v in rows[-1]]))
+            # Our own appends change the modifiedTime too; the next sync must not read
+            # that as an edit
+            _set_meta(conn, "appended_since_sync", "1")
+        _local_writes += 1
+        _stats["rows_appended"] += len(values)
+
+def _incremental_sync():
+    """Append rows added after the watermark. Returns the count, or None if a full sync is needed."""
+    with _lock:
+        conn = _connect()
+        row_count = int(_get_meta(conn, "row_count") or 0)
+        headers = json.loads(_get_meta(conn, "headers") or "null")
+        tail_row = json.loads(_get_meta(conn, "tail_row") or "null")
+        full_synced_at = float(_get_meta(conn, "full_synced_at") or 0)
+        modified_time = _get_meta(conn, "modified_time") or None
+        appended = _get_meta(conn, "appended_since_sync") == "1"
+    if row_count < 1 or headers is None or tail_row is None:
+        return None
+    if time.time() - full_synced_at > FULL_RELOAD_INTERVAL:
+        return None
+
+    new_rows, current_modified_time = fetch_changes(row_count, headers, tail_row, modified_time, appended)
+    if new_rows is None:
+        logger.info("Sheet rows were edited or deleted; running a full sync.")
+        return None
+    with _lock:
+        if new_rows:
+            append_rows(new_rows, row_count + 1)
+        with conn:
+            _set_meta(conn, "synced_at", str(time.time()))
+            _set_meta(conn, "modified_time", current_modified_time or "")
+            _set_meta(conn, "appended_since_sync", "0")
+    _stats["incremental_syncs"] += 1
+    return len(new_rows)
+
+def sync_from_sheet(full: bool = False):
+    """
+    Bring the store up to date with the sheet, incrementally unless `full` is set or
+    the watermark check fails. Returns the number of changed rows.
+    """
+    if not is_enabled() or get_worksheet() is None:
+        return None
+    try:
+        changed = None
+        if not full and is_ready():
+            changed = _incremental_sync()
+        if changed is None:
+            # Read first, so a write during the download shows up as a change next time
+            modified_time = get_modified_time()
+            data = get_all_values()
+            changed = replace_all(data, modified_time)
+            _stats["full_syncs"] += 1
+        _stats["syncs"] += 1
+        return changed
+    except Exception as e:
+        _stats["sync_errors"] += 1
+        logger.error(f"Error syncing local store with Sheets: {e}")
+        return None
+
+def is_sync_running():
+    return _sync_thread is not None and _sync_thread.is_alive()
+
+def _sync_loop():
+    # Sync once straight away: while this thread is alive the snapshot trusts the
+    # store, so it must not wait a whole interval for its first reconciliation
+    sync_from_sheet()
+    while not _sync_stop.wait(SYNC_INTERVAL):
+        sync_from_sheet()
+
+def start_background_sync():
+    """Start the periodic sheet -> store reconciliation thread (no-op if disabled)."""
+    global _sync_thread
+    if not is_enabled() or is_sync_running():
+        return
+    _sync_stop.clear()
+    _sync_thread = threading.Thread(target=_sync_loop, name="store-sync", daemon=True)
+    _sync_thread.start()
+
+def stop_background_sync():
+    _sync_stop.set()
+
+def get_store_stats():
+    with _lock:
+        enabled = _connect() is not None
+        synced_at = last_synced_at() if enabled else None
+        return {
+            **_stats,
+            "enabled": enabled,
+            "ready": is_ready() if enabled else False,
+            "path": os.path.abspath(STORE_PATH),
+            "rows": _conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] if enabled else 0,
+            "seconds_since_sync": time.time() - synced_at if synced_at else None,
+            "sync_interval_seconds": SYNC_INTERVAL,
+            "background_sync": is_sync_running()
+        }
@@ -0,0 +1,60 @@
+# backend/services/streaming.py
+"""Incremental parsing of a streamed JSON array of transactions."""
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class JsonArrayStreamParser:
+    """
+    Feed it text as it arrives; it returns each top-level object of the JSON array as
+    soon as the object's closing brace is seen. Anything before the opening '[' (such as
+    a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer = []
+
+    def feed(self, text: str):
+        objects = []
+        for ch in text:
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                # Between objects: skip commas, whitespace and the closing ']'
+                if ch == "{":
+                    self._depth = 1
+                    self._buffer = [ch]
+                continue
+
+            self._buffer.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._buffer)
+                    self._buffer = []
+                    try:
+                        objects.append(json.loads(raw))
+                    except ValueError as e:
+                        logger.warning(f"Skipping malformed streamed object: {e}")
+        return objects
@@ -0,0 +1,98 @@
+# backend/services/uploads.py
+"""
+Bounded handling of uploaded files.
+
+Uploads are never read into memory whole: Starlette's multipart parser spools each file
+to disk once it passes UPLOAD_SPOOL_MB, UploadLimitMiddleware rejects bodies larger than
+MAX_UPLOAD_MB with a 413 (from Content-Length before anything is read, or as soon as a
+chunked body crosses the limit), and the data URL sent to the LLM is base64-encoded
+from the file in chunks.
+"""
+import base64
+import hashlib
+import os
+
+from starlette.exceptions import HTTPException
+from starlette.formparsers import MultiPartParser
+from starlette.responses import JSONResponse
+
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "20")) * 1024 * 1024)
+UPLOAD_SPOOL_BYTES = int(float(os.getenv("UPLOAD_SPOOL_MB", "1")) * 1024 * 1024)
+# A multiple of 3, so each chunk base64-encodes without padding
+CHUNK_SIZE = 3 * 256 * 1024
+
+UPLOAD_PATH_PREFIX = "/api/process"
+
+def _too_large_detail():
+    return f"Upload exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit."
+
+class UploadLimitMiddleware:
+    """Rejects request bodies over MAX_UPLOAD_BYTES on the upload endpoints."""
+
+    def __init__(self, app):
+        self.app = app
+        MultiPartParser.spool_max_size = UPLOAD_SPOOL_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(UPLOAD_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+            response = JSONResponse({"detail": _too_large_detail()}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_UPLOAD_BYTES:
+                    # Raised inside body parsing, so FastAPI turns it into a 413 response
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+def content_size(source):
+    """Size in bytes of `source` (bytes or a seekable file)."""
+    if isinstance(source, (bytes, bytearray)):
+        return len(source)
+    position = source.tell()
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(position)
+    return size
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """Yield `source` (bytes or a file, read from the start) in chunks."""
+    if isinstance(source, (bytes, bytearray)):
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+        return
+    source.seek(0)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def hash_content(source):
+    """SHA-256 digest of `source`, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in iter_chunks(source):
+        digest.update(chunk)
+    return digest.digest()
+
+def encode_data_url(source, mime_type: str):
+    """data: URL for `source`, base64-encoded chunk by chunk rather than from one big copy."""
+    parts = [f"data:{mime_type};base64,"]
+    for chunk in iter_chunks(source):
+        parts.append(base64.b64encode(chunk).decode("ascii"))
+    return "".join(parts)
@@ -0,0 +1,184 @@
+# backend/services/vectorized.py
+"""
+NumPy builder for the aggregate index, used for large histories.
+
+The snapshot is loaded into typed columns (float64 amounts, integer codes for type,
+category and year/month, datetime64 dates). Strings are parsed once per distinct value
+rather than once per row, and every total is a grouped reduction. Grouped sums use
+np.bincount, which adds weights one row at a time in row order, so the results are
+bit-for-bit identical to the row-by-row AggregateIndex.add path.
+"""
+import numpy as np
+
+from services.aggregates import AggregateIndex, parse_amount, parse_date, TRANSACTION_KINDS
+
+INCOME, EXPENSE, SAVINGS, OTHER = 0, 1, 2, 3
+
+def _factorize(values):
+    """(uniques, codes) for a list of strings."""
+    uniques, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    return uniques.tolist(), codes.reshape(-1)
+
+def _parse_amounts(raw):
+    """float64 amounts plus a mask of rows whose amount parsed."""
+    stripped = np.char.lstrip(np.asarray([str(a) for a in raw], dtype=str), "'")
+    try:
+        return stripped.astype(np.float64), np.ones(len(raw), dtype=bool)
+    except ValueError:
+        pass
+    amounts = np.zeros(len(raw), dtype=np.float64)
+    valid = np.zeros(len(raw), dtype=bool)
+    for i, value in enumerate(raw):
+        try:
+            amounts[i] = parse_amount(value)
+            valid[i] = True
+        except (ValueError, TypeError):
+            continue
+    return amounts, valid
+
+def _grouped(group_codes, weights, n_groups):
+    """Per-group sums (in row order) and row counts."""
+    sums = np.bincount(group_codes, weights=weights, minlength=n_groups)
+    counts = np.bincount(group_codes, minlength=n_groups)
+    return sums, counts
+
+def _total(value, count):
+    # The row-by-row path starts every total at int 0; keep that when nothing was added
+    return float(value) if count else 0
+
+def _ordered_groups(keys):
+    """Unique keys, their inverse codes, and the group order by first appearance."""
+    uniques, first_index, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return uniques, inverse.reshape(-1), np.argsort(first_index, kind="stable")
+
+def build_index(transactions, savings_categories, overall_savings_categories):
+    """Build an AggregateIndex equal to AggregateIndex.add_all(transactions)."""
+    index = AggregateIndex(savings_categories, overall_savings_categories)
+    n = len(transactions)
+    index.row_count = n
+    index._last_row = transactions[-1] if n else None
+    if not n:
+        return index
+
+    amounts, amount_valid = _parse_amounts([t.get('Amount', 0) for t in transactions])
+
+    type_uniques, type_codes = _factorize([t.get('Type', '') for t in transactions])
+    type_lookup = {"income": INCOME, "expense": EXPENSE, "savings": SAVINGS}
+    types = np.array([type_lookup.get(u.strip().lower(), OTHER) for u in type_uniques], dtype=np.int64)[type_codes]
+
+    cat_uniques, cat_codes = _factorize([t['Category'] for t in transactions])
+    is_savings_cat = np.array([c in index.savings_categories for c in cat_uniques], dtype=bool)[cat_codes]
+
+    # --- All-time savings (category compared stripped) ---
+    stripped_uniques = [c.strip() for c in cat_uniques]
+    overall_names, overall_of_unique = np.unique(np.asarray(stripped_uniques, dtype=str), return_inverse=True)
+    overall_codes = overall_of_unique.reshape(-1)[cat_codes]
+    is_overall_cat = np.array([c in index.overall_savings_categories for c in stripped_uniques], dtype=bool)[cat_codes]
+
+    overall_sign = np.zeros(n, dtype=np.float64)
+    overall_sign[types == SAVINGS] = 1.0
+    overall_sign[(types == EXPENSE) & is_overall_cat] = -1.0
+    overall_sign[(types == INCOME) & is_overall_cat] = 1.0
+    contributes = amount_valid & (overall_sign != 0)
+    if contributes.any():
+        weights = amounts[contributes] * overall_sign[contributes]
+        index.overall_total = float(np.bincount(np.zeros(weights.size, dtype=np.int64), weights=weights)[0])
+        uniques, inverse, order = _ordered_groups(overall_codes[contributes])
+        sums, _ = _grouped(inverse, weights, len(uniques))
+        for g in order:
+            index.overall_breakdown[str(overall_names[uniques[g]])] = float(sums[g])
+
+    # --- Year / Month columns ---
+    # Buckets are keyed by the parsed year, so strings such as "2025" and "2025 " must
+    # share a code: factorize the raw strings, then group them by their int value
+    year_uniques, raw_year_codes = _factorize([t.get('Year', '') for t in transactions])
+    year_values = []
+    for y in year_uniques:
+        try:
+            year_values.append(int(y) if y else 0)
+        except (ValueError, TypeError):
+            year_values.append(None)
+    index.years.update(v for y, v in zip(year_uniques, year_values) if y and v is not None)
+
+    distinct_years = sorted({v for v in year_values if v is not None})
+    year_id = {v: i for i, v in enumerate(distinct_years)}
+    year_codes = np.array([year_id.get(v, -1) if v is not None else -1 for v in year_values], dtype=np.int64)[raw_year_codes]
+    year_ok = year_codes >= 0
+
+    month_uniques, month_codes = _factorize([t.get('Month', '') for t in transactions])
+
+    rows = np.flatnonzero(year_ok & amount_valid)
+    if not rows.size:
+        return index
+
+    key_codes = year_codes[rows] * len(month_uniques) + month_codes[rows]
+    keys, key_inverse, key_order = _ordered_groups(key_codes)
+    n_keys = len(keys)
+    for g in key_order:
+        key = keys[g]
+        year = distinct_years[key // len(month_uniques)]
+        index.months[(year, month_uniques[key % len(month_uniques)])] = {
+            "income": 0, "expense": 0, "savings": 0,
+            "income_breakdown": {}, "expense_breakdown": {}, "savings_breakdown": {},
+            "daily": {}
+        }
+    bucket_keys = list(index.months.keys())
+    bucket_of_group = np.empty(n_keys, dtype=np.int64)
+    bucket_of_group[key_order] = np.arange(n_keys)
+    bucket_codes = bucket_of_group[key_inverse]
+
+    row_types = types[rows]
+    row_savings_cat = is_savings_cat[rows]
+    row_amounts = amounts[rows]
+
+    # Which total each row feeds and with what sign (expenses from a savings fund are withdrawals)
+    field = np.full(rows.size, OTHER, dtype=np.int64)
+    sign = np.ones(rows.size, dtype=np.float64)
+    field[row_types == INCOME] = INCOME
+    field[(row_types == EXPENSE) & ~row_savings_cat] = EXPENSE
+    field[(row_types == EXPENSE) & row_savings_cat] = SAVINGS
+    sign[(row_types == EXPENSE) & row_savings_cat] = -1.0
+    field[row_types == SAVINGS] = SAVINGS
+
+    kinds = np.flatnonzero(field != OTHER)
+    weights = row_amounts[kinds] * sign[kinds]
+    sums, counts = _grouped(bucket_codes[kinds] * 3 + field[kinds], weights, n_keys * 3)
+    for b, key in enumerate(bucket_keys):
+        bucket = index.months[key]
+        for f, name in enumerate(TRANSACTION_KINDS):
+            bucket[name] = _total(sums[b * 3 + f], counts[b * 3 + f])
+
+    breakdown_codes = (bucket_codes[kinds] * 3 + field[kinds]) * len(cat_uniques) + cat_codes[rows][kinds]
+    uniques, inverse, order = _ordered_groups(breakdown_codes)
+    sums, _ = _grouped(inverse, weights, len(uniques))
+    for g in order:
+        code = uniques[g]
+        cat = cat_uniques[code % len(cat_uniques)]
+        b, f = divmod(code // len(cat_uniques), 3)
+        index.months[bucket_keys[b]][f"{TRANSACTION_KINDS[f]}_breakdown"][cat] = float(sums[g])
+
+    # --- Daily chart buckets (need a parseable date) ---
+    date_uniques, date_codes = _factorize([transactions[i]['Date'] for i in rows])
+    parsed = [parse_date(d) for d in date_uniques]
+    dates = np.array([p.date() if p else None for p in parsed], dtype="datetime64[D]")[date_codes]
+    dated = ~np.isnat(dates)
+    days = (dates - dates.astype("datetime64[M]")).astype(np.int64) + 1
+
+    day_rows = np.flatnonzero(dated)
+    day_keys = bucket_codes[day_rows] * 32 + days[day_rows]
+    uniques, inverse, order = _ordered_groups(day_keys)
+    for g in order:
+        b, day = divmod(int(uniques[g]), 32)
+        index.months[bucket_keys[b]]["daily"][day] = {"day": day, "income": 0, "expense": 0, "savings": 0}
+
+    day_kinds = np.flatnonzero(dated & (field != OTHER))
+    day_weights = row_amounts[day_kinds] * sign[day_kinds]
+    sums, counts = _grouped(inverse[np.searchsorted(day_rows, day_kinds)] * 3 + field[day_kinds], day_weights, len(uniques) * 3)
+    for g, code in enumerate(uniques):
+        b, day = divmod(int(code), 32)
+        daily = index.months[bucket_keys[b]]["daily"][day]
+        for f, name in enumerate(TRANSACTION_KINDS):
+            if counts[g * 3 + f]:
+                daily[name] = float(sums[g * 3 + f])
+
+    return index
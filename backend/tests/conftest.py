@@ -0,0 +1,7 @@
+# backend/tests/conftest.py
+import os
+import sys
+
+# Tests import the app's modules the way main.py does (from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LOCAL_STORE_ENABLED", "0")
@@ -0,0 +1,64 @@
+# backend/tests/test_extraction.py
+"""LLM extraction: dates are normalized to YYYY-MM-DD, unparseable ones become today."""
+import asyncio
+import json
+import re
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from services import processing
+
+def _fake_client(items):
+    content = json.dumps(items)
+
+    async def chunks():
+        for start in range(0, len(content), 7):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content[start:start + 7]))])
+
+    async def create(model=None, messages=None, stream=False, **kwargs):
+        if stream:
+            return chunks()
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+@pytest.fixture
+def llm(monkeypatch):
+    def install(items):
+        monkeypatch.setattr(processing, "client", _fake_client(items))
+    return install
+
+ITEMS = [
+    {"transaction_type": "expense", "date": "CURRENT_DATE", "amount": 500.0, "category": "food"},
+    {"transaction_type": "expense", "date": "2025-03-02", "amount": 120.0, "category": "transport"},
+    {"transaction_type": "expense", "amount": 80.0, "category": "food"},
+    {"transaction_type": "expense", "date": "15/03/2025", "amount": 950.0, "category": "food"},
+    {"transaction_type": "expense", "date": "<current date>", "amount": 60.0, "category": "food"},
+]
+
+def _dates(items):
+    return [item["date"] for item in items]
+
+def test_extract_replaces_non_iso_dates(llm):
+    llm(ITEMS)
+    today = datetime.now().strftime("%Y-%m-%d")
+    extracted = asyncio.run(processing.extract([{"role": "user", "content": "lunch 500"}]))
+    assert _dates(extracted) == [today, "2025-03-02", today, "2025-03-15", today]
+
+def test_stream_replaces_non_iso_dates(llm):
+    llm(ITEMS)
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    async def collect():
+        return [e async for e in processing.stream_llm_response([{"role": "user", "content": "lunch 500"}])]
+
+    events = asyncio.run(collect())
+    assert _dates(e["data"] for e in events if e["type"] == "transaction") == [today, "2025-03-02", today, "2025-03-15", today]
+
+def test_prompt_examples_have_no_date_the_model_could_copy():
+    prompt = processing.get_system_prompt("2025-06-18")
+    example_dates = re.findall(r'"date": "([^"]*)"', prompt)
+    assert example_dates
+    assert all(processing.parse_date(d) is None for d in example_dates)
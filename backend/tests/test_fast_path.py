@@ -0,0 +1,57 @@
+# backend/tests/test_fast_path.py
+"""Rule-based extraction: simple entries are parsed, ambiguous ones go to the LLM."""
+import pytest
+
+from services.processing import FAST_PATH_MIN_CONFIDENCE, fast_path_extract
+
+TODAY = "2025-06-18"  # a Wednesday
+
+def _accepted(text):
+    extracted, confidence = fast_path_extract(text, TODAY)
+    if extracted is None or confidence < FAST_PATH_MIN_CONFIDENCE:
+        return None
+    return extracted[0]
+
+@pytest.mark.parametrize("text", [
+    # Money coming back, not an expense of that category
+    "sold my old shoes for 1200",
+    "got 500 back from rahim for the lunch i covered",
+    "refund of coffee machine 4500 credited to bank",
+    # Withdrawals from a savings fund, which the rules would book as deposits
+    "withdrew 2000 from emergency fund",
+    "took 2000 from emergency fund",
+    "used 2000 from emergency fund",
+    "transferred 2000 out of emergency fund",
+    "moved 2000 out of emergency fund",
+    "emergency fund 2000",
+    # A date the rules don't parse
+    "netflix 1200 for march",
+    # Several transactions, no category, contradictory categories
+    "lunch 250 and dinner 400",
+    "250 for something",
+    "lunch and movie 600",
+])
+def test_falls_back_to_llm(text):
+    assert _accepted(text) is None
+
+@pytest.mark.parametrize("text, expected", [
+    ("lunch 250", {"transaction_type": "expense", "category": "food", "amount": 250.0, "date": TODAY}),
+    ("paid 120 for uber yesterday", {"category": "travel", "amount": 120.0, "date": "2025-06-17"}),
+    ("coffee 80 bkash", {"category": "food", "vault_location": "Bkash", "amount": 80.0}),
+    ("salary 50k", {"transaction_type": "income", "category": "job", "amount": 50000.0}),
+    ("lunch 250 at cafe", {"category": "food", "amount": 250.0}),
+    ("saved 2000 in emergency fund", {"transaction_type": "savings", "category": "emergency fund", "amount": 2000.0}),
+    ("gym 1500 last monday at 7pm", {"category": "fitness", "date": "2025-06-16", "time": "19:00"}),
+])
+def test_simple_entries_use_rules(text, expected):
+    transaction = _accepted(text)
+    assert transaction is not None
+    for key, value in expected.items():
+        assert transaction[key] == value, key
+
+def test_each_unknown_word_lowers_confidence():
+    _, one = fast_path_extract("lunch 250 at cafe", TODAY)
+    _, two = fast_path_extract("lunch 250 at cafe downtown", TODAY)
+    _, none = fast_path_extract("lunch 250", TODAY)
+    assert none > one > two
+    assert two < FAST_PATH_MIN_CONFIDENCE
@@ -0,0 +1,55 @@
+# backend/tests/test_snapshot.py
+"""Incremental refreshes from Sheets."""
+from benchmarks.datasets import HEADERS
+from benchmarks.fakes import install_fake_sheets
+from services import sheets, snapshot
+
+def test_incremental_refresh_reads_rows_missing_trailing_cells(monkeypatch):
+    rows = [list(HEADERS), ["2025-06-01", "10", "food", "expense", "lunch", "", "2025", "June"]]
+    worksheet = install_fake_sheets(rows)
+    snapshot.invalidate()
+    assert len(snapshot.get_transactions()) == 1
+
+    # Sheets returns appended rows without their empty trailing cells
+    worksheet.rows.append(["2025-06-02", "20", "food", "expense"])
+    worksheet.touch()
+    assert sheets.fetch_rows_after(2, HEADERS, rows[1]) == [["2025-06-02", "20", "food", "expense", "", "", "", ""]]
+
+    monkeypatch.setattr(snapshot, "SNAPSHOT_TTL", 0)
+    transactions = snapshot.get_transactions()
+    assert worksheet.calls["get_all_values"] == 1
+    assert [t["Amount"] for t in transactions] == ["10", "20"]
+    assert transactions[-1]["Description"] == ""
+
+def _load(rows, monkeypatch):
+    worksheet = install_fake_sheets(rows)
+    snapshot.invalidate()
+    snapshot.get_transactions()
+    monkeypatch.setattr(snapshot, "SNAPSHOT_TTL", 0)
+    return worksheet
+
+ROWS = [
+    list(HEADERS),
+    ["2025-06-01", "10", "food", "expense", "lunch", "", "2025", "June"],
+    ["2025-06-02", "20", "food", "expense", "dinner", "", "2025", "June"],
+]
+
+def test_unchanged_sheet_is_not_read_again(monkeypatch):
+    worksheet = _load([list(r) for r in ROWS], monkeypatch)
+    assert len(snapshot.get_transactions()) == 2
+    assert worksheet.calls == {"get_all_values": 1}
+
+def test_edit_above_the_watermark_triggers_a_full_reload(monkeypatch):
+    worksheet = _load([list(r) for r in ROWS], monkeypatch)
+    worksheet.rows[1][1] = "15"
+    worksheet.touch()
+    assert [t["Amount"] for t in snapshot.get_transactions()] == ["15", "20"]
+    assert worksheet.calls["get_all_values"] == 2
+
+def test_own_appends_are_not_mistaken_for_edits(monkeypatch):
+    worksheet = _load([list(r) for r in ROWS], monkeypatch)
+    row = ["2025-06-03", "30", "food", "expense", "coffee", "", "2025", "June"]
+    response = worksheet.append_rows([row])
+    snapshot.record_appended_rows([row], sheets.appended_start_row(response))
+    assert [t["Amount"] for t in snapshot.get_transactions()] == ["10", "20", "30"]
+    assert worksheet.calls["get_all_values"] == 1
@@ -0,0 +1,73 @@
+# backend/tests/test_vectorized.py
+"""The NumPy index builder must produce exactly what AggregateIndex.add_all does."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.datasets import generate_rows
+from services.aggregates import AggregateIndex
+from services.snapshot import parse_rows
+from services.vectorized import build_index
+
+SAVINGS = frozenset({"emergency fund", "investment fund"})
+
+MESSY_ROWS = [
+    # Year strings that parse to the same int share a bucket
+    ["2025-06-01", "12", "food", "expense", "", "", "2025 ", "June"],
+    ["2025-06-02", "'30", "food", "Expense", "", "", " 2025", "June"],
+    ["2025-06-03", "5", "food", "expense", "", "", "02025", "June"],
+    # Unparseable year, missing year, year 0
+    ["2025-06-04", "7", "food", "expense", "", "", "twenty", "June"],
+    ["2025-06-05", "8", "food", "expense", "", "", "", ""],
+    ["2025-06-06", "9", "food", "expense", "", "", "0", "June"],
+    # Bad amount, bad date, unknown type, padded category, savings spending and income
+    ["2025-06-07", "n/a", "food", "expense", "", "", "2025", "June"],
+    ["31/02/2025", "11", "food", "expense", "", "", "2025", "June"],
+    ["2025-06-08", "13", "food", "transfer", "", "", "2025", "June"],
+    ["2025-06-09", "14", " emergency fund ", "savings", "", "", "2025", "June"],
+    ["2025-06-10", "15", "emergency fund", "expense", "", "", "2025", "June"],
+    ["2025-06-11", "16", "investment fund", "income", "", "", "2025", "June"],
+    # Month strings are not normalised by either path
+    ["06/12/2025", "17", "food", "expense", "", "", "2025", "june"],
+    ["2024-12-31", "0.1", "food", "expense", "", "", "2024", "December"],
+    ["2024-12-31", "0.2", "food", "expense", "", "", "2024", "December"],
+]
+
+def _pair(rows):
+    _, transactions = parse_rows(rows)
+    expected = AggregateIndex(SAVINGS, SAVINGS)
+    expected.add_all(transactions)
+    return expected, build_index(transactions, SAVINGS, SAVINGS)
+
+def _assert_same(expected, actual):
+    assert actual.row_count == expected.row_count
+    assert actual.years == expected.years
+    assert actual.overall_total == expected.overall_total
+    assert list(actual.overall_breakdown.items()) == list(expected.overall_breakdown.items())
+    # Same keys in the same (first-appearance) order, same values bit for bit
+    assert list(actual.months) == list(expected.months)
+    for key, bucket in expected.months.items():
+        other = actual.months[key]
+        for field in ("income", "expense", "savings"):
+            assert other[field] == bucket[field], (key, field)
+            assert list(other[f"{field}_breakdown"].items()) == list(bucket[f"{field}_breakdown"].items()), (key, field)
+        assert sorted(other["daily"].items()) == sorted(bucket["daily"].items()), key
+
+def test_messy_rows_match_row_by_row():
+    header = generate_rows(0)
+    expected, actual = _pair(header + MESSY_ROWS)
+    _assert_same(expected, actual)
+    assert expected.months[(2025, "June")]["expense_breakdown"]["food"] == 12 + 30 + 5 + 11
+
+def test_synthetic_history_matches_row_by_row():
+    rows = generate_rows(5000, seed=7, legacy_fraction=0.05, invalid_fraction=0.02)
+    expected, actual = _pair(rows + MESSY_ROWS)
+    _assert_same(expected, actual)
+
+def test_monthly_views_match():
+    expected, actual = _pair(generate_rows(2000, seed=3) + MESSY_ROWS)
+    for month, year in ((6, 2025), (12, 2024), (1, 2023)):
+        assert actual.monthly_summary(month, year) == expected.monthly_summary(month, year)
+        assert actual.chart_data(month, year) == expected.chart_data(month, year)
+    assert actual.overall_savings() == expected.overall_savings()
+    assert actual.available_years() == expected.available_years()
@@ -12,23 +12,15 @@ function Dashboard() {
     const [overallSavings, setOverallSavings] = useState(null);
 
     useEffect(() => {
-        fetchAvailableYears();
-        fetchOverallSavings();
+        fetchInitialData();
     }, []);
 
-    const fetchOverallSavings = async () => {
+    // One request for years and all-time savings instead of one per widget
+    const fetchInitialData = async () => {
         try {
-            const res = await axios.get('/api/analytics/overall-savings');
-            setOverallSavings(res.data);
-        } catch (err) {
-            console.error('Failed to fetch overall savings:', err);
-        }
-    };
-
-    const fetchAvailableYears = async () => {
-        try {
-            const response = await axios.get('/api/summary/available-years');
-            const years = response.data.years || [];
+            const res = await axios.get(`/api/dashboard?month=${month}&year=${year}`);
+            setOverallSavings(res.data.overall_savings);
+            const years = res.data.years || [];
             setAvailableYears(years);
             // Set current year if it exists in available years, otherwise use the latest
             if (years.length > 0) {
@@ -36,15 +28,16 @@ function Dashboard() {
                 setYear(years.includes(currentYear) ? currentYear : years[years.length - 1]);
             }
         } catch (err) {
-            console.error('Failed to fetch available years:', err);
+            console.error('Failed to fetch dashboard data:', err);
         }
     };
 
     const fetchDashboardData = async () => {
         setLoading(true);
         try {
-            const summaryRes = await axios.get(`/api/summary/monthly?month=${month}&year=${year}`);
-            setSummary(summaryRes.data);
+            const res = await axios.get(`/api/dashboard?month=${month}&year=${year}`);
+            setSummary(res.data.summary);
+            setOverallSavings(res.data.overall_savings);
         } catch (err) {
             console.error('Failed to fetch dashboard data:', err);
         } finally {